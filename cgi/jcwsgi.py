@@ -0,0 +1,40 @@
+#!/usr/bin/python
+
+"""
+JobCalc WSGI Entry Point
+========================
+Copyright 2013 Paul Griffiths
+Email: mail@paulgriffiths.net
+
+All rights reserved.
+
+Exposes 'application' for WSGI servers such as mod_wsgi or gunicorn.
+Unlike jc.py, which starts a new process for every drawing, the
+server keeps this process, and the loaded jobcalc package, alive
+across requests.
+
+Run this file directly to serve drawings on a local development
+server, optionally passing the port number as the first argument.
+"""
+
+
+import sys
+from wsgiref.simple_server import make_server
+from jobcalc.wsgi import application
+
+
+def main():
+
+    """
+    Main function for JobCalc WSGI development server.
+    """
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = make_server("localhost", port, application)
+    server.serve_forever()
+
+
+# Call main() function if in __main__ namespace
+
+if __name__ == "__main__":
+    main()
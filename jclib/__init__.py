@@ -32,15 +32,94 @@ Call:
 
   -- DrawingPage.draw(file)
 
-to use.
+to use, where 'file' is a filename or a writable file object, or call:
+
+  -- DrawingPage.draw_bytes()
+
+to get the drawing as bytes. Either may be passed a
+jobcalc.timing.StageTimer as 'timer' to record the time taken by
+each stage of the drawing.
+
+To get the same drawing in several output types at once, call:
+
+  -- DrawingPage.draw_formats(["pdf", "png"])
+
+which returns a dictionary of bytes keyed by output type.
+
+To draw several pages into a single multi-page PDF file, call:
+
+  -- draw_pdf_pack(pages, file)
+
+where 'pages' is a sequence of drawing page objects.
+
+To draw a quick PNG preview of just a component's outline, call:
+
+  -- draw_preview(component, file)
+
+To draw pages concurrently in one process, use a
+jobcalc.threadpool.RenderPool, whose submit() returns a Future.
+
+The drawing classes are imported when first used, so that importing
+the package does not load Pycairo on Python 3.7 and later.
 
 The following helper functions are also imported:
 
   -- html_fail(msg)
+  -- html_error(msg)
+
+For quoting without drawing, jobcalc.geometry.BendGeometry provides
+the segment dimensions, radii and segment counts of a bend without
+using Pycairo.
+
+Form input can be turned into a drawing page with
+jobcalc.form.page_from_form(), and a WSGI application is provided
+by jobcalc.wsgi.application.
 
 """
 
-from jobcalc.pipestraight import PipeStraight
-from jobcalc.pipebend import PipeBend
-from jobcalc.page import DrawingPage
-from jobcalc.helper import html_fail
+import sys
+from importlib import import_module
+from jobcalc.htmlerror import html_fail, html_error
+
+
+# The drawing classes are only imported when they are first used,
+# since importing them loads Pycairo, which is not needed to
+# validate form input or to report errors. Python versions without
+# module __getattr__() support import them straight away.
+
+LAZY_IMPORTS = {"PipeStraight": "jobcalc.pipestraight",
+                "PipeBend": "jobcalc.pipebend",
+                "DrawingPage": "jobcalc.page",
+                "draw_pdf_pack": "jobcalc.page",
+                "draw_preview": "jobcalc.page"}
+
+__all__ = sorted(LAZY_IMPORTS) + ["html_fail", "html_error"]
+
+
+def __getattr__(name):
+
+    """
+    Imports and returns a drawing class or function on first use.
+    """
+
+    if name not in LAZY_IMPORTS:
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+
+    value = getattr(import_module(LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+
+    """
+    Returns the names in the package, including those not yet imported.
+    """
+
+    return sorted(set(globals()) | set(LAZY_IMPORTS))
+
+
+if sys.version_info < (3, 7):
+    for lazy_name in LAZY_IMPORTS:
+        __getattr__(lazy_name)
@@ -0,0 +1,264 @@
+"""
+Provides a command line batch renderer for JobCalc.
+
+Jobs are read from a manifest file, either a CSV file with a header
+row or a JSONL file with one JSON object per line. Each job uses the
+same field names as the HTML form, e.g. "jobtype", "casingod" and
+"output", plus an optional "outfile" naming the file to write in the
+output directory. Only the last part of the name is used, and jobs
+reusing a name already taken are named from their job number instead.
+
+Jobs are rendered in parallel in a pool of worker processes, one per
+CPU core by default, and the time taken for each job is reported.
+Alternatively, all jobs can be drawn in order as the pages of a single
+PDF project pack.
+
+To use:
+
+  -- python -m jobcalc.batch [-o OUTDIR] [-j PROCESSES] MANIFEST
+  -- python -m jobcalc.batch --pack PDFFILE MANIFEST
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from jobcalc.form import page_from_form, page_from_spec, DictForm, FormError
+from jobcalc.jobspec import validate_many, output_name
+
+
+def read_manifest(path):
+
+    """
+    Returns a list of job dictionaries read from a manifest file.
+
+    Files with a ".csv" extension are read as CSV, and all others
+    as JSONL. Blank lines in JSONL files are ignored.
+
+    Arguments:
+    path -- path to the manifest file
+    """
+
+    if path.lower().endswith(".csv"):
+        if sys.version_info[0] < 3:
+            infile = open(path, "rb")
+        else:
+            infile = open(path, newline="")
+        with infile:
+            return list(csv.DictReader(infile))
+
+    with open(path) as infile:
+        return [json.loads(line) for line in infile if line.strip()]
+
+
+def render_job(task):
+
+    """
+    Renders a single validated job, and returns the result.
+
+    This runs in a worker process. Errors are returned rather than
+    raised, so that one bad job does not stop the batch.
+
+    Arguments:
+    task -- tuple of (job number, validated job specification,
+    output path)
+
+    Returns a tuple of (job number, output path, seconds taken, error),
+    where 'error' is None if the job succeeded.
+    """
+
+    num, spec, path = task
+    start = time.time()
+
+    try:
+        page = page_from_spec(spec)
+        with open(path, "wb") as outfile:
+            page.draw(outfile)
+        error = None
+    except Exception as err:            # pylint: disable=W0703
+        error = "%s: %s" % (err.__class__.__name__, err)
+
+    return (num, path, time.time() - start, error)
+
+
+def render_batch(jobs, outdir, processes=None, report=None):
+
+    """
+    Renders a list of jobs in a pool of worker processes.
+
+    All the jobs are validated in one pass before any rendering
+    starts, and invalid jobs are reported as failed, with all their
+    errors, without being sent to the workers. Valid jobs are given
+    unique file names in the output directory, as for jobcalc.wsgi
+    batches, and the workers draw from their validated specifications.
+
+    Returns a list of results, as returned by render_job(), in job
+    order.
+
+    Arguments:
+    jobs -- list of job dictionaries
+    outdir -- directory in which to write the drawings
+    processes -- number of worker processes, defaults to the number
+    of CPU cores
+    report -- optional function called with each result as it completes
+    """
+
+    tasks = []
+    results = []
+    names = set()
+
+    validated = validate_many(jobs)
+
+    for num, job in enumerate(jobs, 1):
+        spec, errors = validated[num - 1]
+        if errors:
+            result = (num, None, 0, "; ".join(errors))
+            results.append(result)
+            if report:
+                report(result)
+        else:
+            name = output_name(job, spec, num, names)
+            tasks.append((num, spec, os.path.join(outdir, name)))
+
+    pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+
+    try:
+        for result in pool.imap_unordered(render_job, tasks):
+            results.append(result)
+            if report:
+                report(result)
+    finally:
+        pool.close()
+        pool.join()
+
+    results.sort()
+    return results
+
+
+def render_pack(jobs, path, report=None):
+
+    """
+    Draws a list of jobs as the pages of a single PDF file.
+
+    Jobs which fail validation, or fail to draw, are left out of the
+    pack and reported as failed. If no pages are drawn, no file is
+    written. The time reported for each page is the time taken to
+    draw it.
+
+    Returns a list of results, as returned by render_job(), in job
+    order.
+
+    Arguments:
+    jobs -- list of job dictionaries
+    path -- path of the PDF file to write
+    report -- optional function called with each result as it completes
+    """
+
+    # Imported here, as in jobcalc.form, so that the batch renderer
+    # does not load Pycairo before the jobs have been validated.
+
+    from jobcalc.page import draw_pdf_pack
+
+    results = []
+    failures = []
+
+    def pages():
+
+        """
+        Generates the pages of the pack, recording results.
+        """
+
+        for num, job in enumerate(jobs, 1):
+            start = time.time()
+            try:
+                page = page_from_form(DictForm(job))[0]
+            except FormError as err:
+                result = (num, None, time.time() - start, str(err))
+            else:
+                yield page
+                if failures:
+                    err = failures.pop()
+                    result = (num, None, time.time() - start,
+                              "%s: %s" % (err.__class__.__name__, err))
+                else:
+                    result = (num, path, time.time() - start, None)
+            results.append(result)
+            if report:
+                report(result)
+
+    def page_failed(page, err):         # pylint: disable=W0613
+
+        """
+        Records a page which failed to draw.
+        """
+
+        failures.append(err)
+
+    draw_pdf_pack(pages(), path, page_failed)
+
+    return results
+
+
+def print_result(result):
+
+    """
+    Prints a one line report of a job result.
+    """
+
+    num, path, secs, error = result
+    if error:
+        print("job %d: FAILED in %.3fs: %s" % (num, secs, error))
+    else:
+        print("job %d: %s in %.3fs" % (num, path, secs))
+
+
+def main():
+
+    """
+    Main function for JobCalc batch renderer.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Render JobCalc drawings from a job manifest.")
+    parser.add_argument("manifest", help="CSV or JSONL job manifest")
+    parser.add_argument("-o", "--outdir", default=".",
+                        help="directory for drawings (default: .)")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (default: CPU cores)")
+    parser.add_argument("--pack", metavar="PDFFILE", default=None,
+                        help="draw all jobs into a single PDF file")
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+
+    start = time.time()
+    if args.pack:
+        results = render_pack(jobs, args.pack, print_result)
+    else:
+        if not os.path.isdir(args.outdir):
+            os.makedirs(args.outdir)
+        results = render_batch(jobs, args.outdir,
+                               args.processes, print_result)
+    elapsed = time.time() - start
+
+    failed = len([r for r in results if r[3]])
+    print("%d jobs, %d failed, %.3fs total, %.1f jobs/s" %
+          (len(results), failed, elapsed,
+           len(results) / elapsed if elapsed else 0))
+
+    sys.exit(1 if failed else 0)
+
+
+# Call main() function if in __main__ namespace
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Provides a benchmark suite for JobCalc components and drawing pages.
+
+Each benchmark is run a number of times, and the minimum, median and
+mean wall times are recorded. The benchmarks cover:
+
+  -- construction of PipeBend and PipeStraight components
+  -- set_scale() and draw_component() on a recording surface
+  -- full DrawingPage.draw() for each output type and page size
+  -- DrawingPage.draw_formats() for all output types at once
+  -- draw_preview() of each component's outline as a small PNG
+
+using a mix of parameters from coarse to very fine segment angles,
+since the number of segments dominates the work done for a bend.
+
+Optionally, the throughput of drawing pages in a RenderPool is also
+measured for each output type at each of a number of thread counts.
+
+Results are written as JSON, and can be compared with an earlier run
+to flag benchmarks which have become slower.
+
+To use:
+
+  -- python -m jobcalc.bench [-r REPEAT] [-k FILTER] [-o RESULTS]
+  -- python -m jobcalc.bench --compare BASELINE [--threshold 0.1]
+  -- python -m jobcalc.bench --scaling 1,2,4,8 [--pages 64]
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import sys
+import json
+import time
+import platform
+import argparse
+from io import BytesIO
+from timeit import default_timer
+import cairo
+from jobcalc.pipestraight import PipeStraight
+from jobcalc.pipebend import PipeBend
+from jobcalc.page import DrawingPage, draw_preview
+from jobcalc.threadpool import RenderPool
+
+
+# Representative components. Bends run from coarse to very fine
+# segment angles, with the segment count shown in the name.
+
+COMPONENTS = [("bend90-seg30", PipeBend,
+               {"nomrad": 400, "casingod": 200, "casingid": 180,
+                "liningod": 160, "liningid": 140, "bendangle": 90,
+                "segangle": 30, "ctype": "segmented", "flange": "150PN16",
+                "exdimdrg": True, "exdimbox": True}),
+              ("bend90-seg7.5", PipeBend,
+               {"nomrad": 600, "casingod": 300, "casingid": 270,
+                "liningod": 250, "liningid": 230, "bendangle": 90,
+                "segangle": 7.5, "ctype": "segmented", "flange": "250PN16",
+                "exdimdrg": True, "exdimbox": True}),
+              ("bend45-seg1", PipeBend,
+               {"nomrad": 800, "casingod": 400, "casingid": 380,
+                "liningod": 350, "liningid": 330, "bendangle": 45,
+                "segangle": 1, "ctype": "onepiece", "flange": "400PN16",
+                "exdimdrg": False, "exdimbox": True}),
+              ("bend90-seg0.25", PipeBend,
+               {"nomrad": 500, "casingod": 150, "casingid": 130,
+                "liningod": 110, "liningid": 100, "bendangle": 90,
+                "segangle": 0.25, "ctype": "onepiece", "flange": "125PN16",
+                "exdimdrg": False, "exdimbox": False}),
+              ("straight", PipeStraight,
+               {"length": 1200, "casingod": 200, "casingid": 180,
+                "liningod": 160, "liningid": 140, "flange": "150PN16"})]
+
+OTYPES = ["pdf", "svg", "png"]
+OSIZES = ["A4", "Letter"]
+
+# Size of the drawing area passed to components, roughly that of
+# an A4 page once the margins and title block are taken off.
+
+AREA_W = 476
+AREA_H = 520
+
+# Component drawn when measuring thread scaling.
+
+SCALING_COMPONENT = "bend90-seg7.5"
+
+
+def construct_setup(cls, params):
+
+    """
+    Returns a setup function for timing component construction.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        return lambda: cls(**params)
+
+    return setup
+
+
+def set_scale_setup(cls, params):
+
+    """
+    Returns a setup function for timing set_scale().
+
+    set_scale() changes the component, so a new component is created
+    for each run, outside of the timing.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        component = cls(**params)
+        ctx = cairo.Context(cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                                   None))
+        component.draw_pre_scale(ctx, AREA_W, AREA_H)
+        return lambda: component.set_scale(ctx, AREA_W, AREA_H)
+
+    return setup
+
+
+def draw_component_setup(cls, params):
+
+    """
+    Returns a setup function for timing draw_component() on a
+    component which has already been scaled.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        component = cls(**params)
+        ctx = cairo.Context(cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                                   None))
+        component.draw_pre_scale(ctx, AREA_W, AREA_H)
+        component.set_scale(ctx, AREA_W, AREA_H)
+        ctx.set_source_rgb(*component.drawing_line_color)
+        ctx.set_line_width(component.drawing_line_width)
+        return lambda: component.draw_component(ctx, AREA_W, AREA_H)
+
+    return setup
+
+
+def draw_page_setup(cls, params, otype, osize):
+
+    """
+    Returns a setup function for timing a full page draw, including
+    encoding the output.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        page = DrawingPage(component=cls(**params), otype=otype,
+                           osize=osize, title="Benchmark drawing",
+                           projno="1234", drgno="BM-001", qty=1,
+                           customer="Customer")
+        return lambda: page.draw(BytesIO())
+
+    return setup
+
+
+def draw_formats_setup(cls, params, osize):
+
+    """
+    Returns a setup function for timing drawing a page in all
+    output types at once.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        page = DrawingPage(component=cls(**params), osize=osize,
+                           title="Benchmark drawing", projno="1234",
+                           drgno="BM-001", qty=1, customer="Customer")
+        return lambda: page.draw_formats(OTYPES)
+
+    return setup
+
+
+def draw_preview_setup(cls, params):
+
+    """
+    Returns a setup function for timing a component preview,
+    including encoding the PNG.
+    """
+
+    def setup():
+
+        """
+        Returns the function to time.
+        """
+
+        component = cls(**params)
+        return lambda: draw_preview(component, BytesIO())
+
+    return setup
+
+
+def get_benchmarks():
+
+    """
+    Returns a list of (name, setup function) tuples for all
+    the benchmarks.
+    """
+
+    benchmarks = []
+
+    for name, cls, params in COMPONENTS:
+        benchmarks.append(("construct/" + name,
+                           construct_setup(cls, params)))
+        benchmarks.append(("set_scale/" + name,
+                           set_scale_setup(cls, params)))
+        benchmarks.append(("draw_component/" + name,
+                           draw_component_setup(cls, params)))
+        for otype in OTYPES:
+            for osize in OSIZES:
+                benchmarks.append(("draw/%s/%s/%s" % (otype, osize, name),
+                                   draw_page_setup(cls, params,
+                                                   otype, osize)))
+        for osize in OSIZES:
+            benchmarks.append(("draw_formats/%s/%s" % (osize, name),
+                               draw_formats_setup(cls, params, osize)))
+        benchmarks.append(("preview/" + name,
+                           draw_preview_setup(cls, params)))
+
+    return benchmarks
+
+
+def time_benchmark(setup, repeat):
+
+    """
+    Runs a benchmark and returns a dictionary of timings, in seconds.
+
+    Arguments:
+    setup -- function returning the function to time
+    repeat -- number of timed runs
+    """
+
+    # One untimed run, to fill any caches as a long-running
+    # process would have done.
+
+    setup()()
+
+    times = []
+    for run in range(repeat):           # pylint: disable=W0612
+        func = setup()
+        start = default_timer()
+        func()
+        times.append(default_timer() - start)
+
+    times.sort()
+    mid = len(times) // 2
+    if len(times) % 2:
+        median = times[mid]
+    else:
+        median = (times[mid - 1] + times[mid]) / 2.0
+
+    return {"min": times[0], "median": median,
+            "mean": sum(times) / len(times), "runs": len(times)}
+
+
+def run_benchmarks(repeat=20, pattern=None, report=None):
+
+    """
+    Runs the benchmarks and returns the results as a dictionary
+    suitable for writing as JSON.
+
+    Arguments:
+    repeat -- number of timed runs of each benchmark
+    pattern -- optional string, only benchmarks with names
+    containing it are run
+    report -- optional function called with the name and timings
+    of each benchmark as it completes
+    """
+
+    results = {}
+
+    for name, setup in get_benchmarks():
+        if pattern and pattern not in name:
+            continue
+        results[name] = time_benchmark(setup, repeat)
+        if report:
+            report(name, results[name])
+
+    meta = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cairo": cairo.cairo_version_string(),
+            "pycairo": cairo.version,
+            "repeat": repeat}
+
+    return {"meta": meta, "results": results}
+
+
+def thread_scaling(thread_counts, pages=64, report=None):
+
+    """
+    Measures the throughput of drawing pages in a RenderPool for
+    each output type and thread count, and returns the results as a
+    dictionary suitable for writing as JSON.
+
+    The dictionary is keyed by output type, and then by thread count
+    as a string. Each entry holds "pages_per_sec", and "speedup",
+    the throughput relative to the first thread count.
+
+    Arguments:
+    thread_counts -- list of thread counts to measure
+    pages -- number of pages drawn for each measurement
+    report -- optional function called with the output type, thread
+    count and entry of each measurement as it completes
+    """
+
+    cls, params = [(c, p) for n, c, p in COMPONENTS
+                   if n == SCALING_COMPONENT][0]
+    results = {}
+
+    for otype in OTYPES:
+        page = DrawingPage(component=cls(**params), otype=otype,
+                           title="Benchmark drawing", projno="1234",
+                           drgno="BM-001", qty=1, customer="Customer")
+        page.draw_bytes()
+        results[otype] = {}
+        base = None
+
+        for threads in thread_counts:
+            with RenderPool(threads=threads) as pool:
+                start = default_timer()
+                for data in pool.map([page] * pages):  # pylint: disable=W0612
+                    pass
+                secs = default_timer() - start
+
+            rate = pages / secs
+            base = base or rate
+            entry = {"pages_per_sec": rate, "speedup": rate / base}
+            results[otype][str(threads)] = entry
+            if report:
+                report(otype, threads, entry)
+
+    return results
+
+
+def compare_results(baseline, current, threshold=0.1):
+
+    """
+    Compares two sets of benchmark results.
+
+    Median times are compared, since they are less affected than the
+    mean by the occasional slow run. Only benchmarks in both sets
+    are compared.
+
+    Returns a list of (name, baseline median, current median, change)
+    tuples for benchmarks which are slower by more than the threshold,
+    where 'change' is the fractional change in time.
+
+    Arguments:
+    baseline, current -- results returned by run_benchmarks()
+    threshold -- fractional slowdown to flag, e.g. 0.1 for 10%
+    """
+
+    regressions = []
+    old = baseline["results"]
+
+    for name, timings in sorted(current["results"].items()):
+        if name not in old:
+            continue
+        before = old[name]["median"]
+        after = timings["median"]
+        change = (after - before) / before if before else 0
+        if change > threshold:
+            regressions.append((name, before, after, change))
+
+    return regressions
+
+
+def print_timings(name, timings):
+
+    """
+    Prints a one line report of a benchmark's timings.
+    """
+
+    print("%-40s median %9.3fms  min %9.3fms" %
+          (name, timings["median"] * 1000, timings["min"] * 1000))
+
+
+def print_scaling(otype, threads, entry):
+
+    """
+    Prints a one line report of a thread scaling measurement.
+    """
+
+    print("scaling/%-4s %3d threads %9.1f pages/s  %5.2fx" %
+          (otype, threads, entry["pages_per_sec"], entry["speedup"]))
+
+
+def main():
+
+    """
+    Main function for JobCalc benchmark suite.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark JobCalc components and drawing pages.")
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="timed runs of each benchmark (default: 20)")
+    parser.add_argument("-k", "--filter", default=None,
+                        help="only run benchmarks containing this string")
+    parser.add_argument("-o", "--output", default=None,
+                        help="file in which to write JSON results")
+    parser.add_argument("--compare", metavar="BASELINE", default=None,
+                        help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="fractional slowdown flagged as a "
+                             "regression (default: 0.1)")
+    parser.add_argument("--scaling", metavar="THREADS", default=None,
+                        help="comma separated thread counts for which "
+                             "to measure RenderPool throughput")
+    parser.add_argument("--pages", type=int, default=64,
+                        help="pages drawn for each thread scaling "
+                             "measurement (default: 64)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.filter, print_timings)
+
+    if args.scaling:
+        thread_counts = [int(n) for n in args.scaling.split(",")]
+        results["scaling"] = thread_scaling(thread_counts, args.pages,
+                                            print_scaling)
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        regressions = compare_results(baseline, results, args.threshold)
+        for name, before, after, change in regressions:
+            print("REGRESSION %s: %.3fms -> %.3fms (%+.0f%%)" %
+                  (name, before * 1000, after * 1000, change * 100))
+        if regressions:
+            sys.exit(1)
+
+
+# Call main() function if in __main__ namespace
+
+if __name__ == "__main__":
+    main()
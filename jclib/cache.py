@@ -0,0 +1,282 @@
+"""
+Provides a content-addressed cache for rendered drawing pages.
+
+Rendered pages are identified by a hash of the component type and
+construction parameters, the page output type and size, and the
+drawing information shown in the title block. The cache has two
+tiers:
+
+  -- an in-memory, least recently used tier holding a fixed number
+     of drawings
+  -- an optional on-disk tier, bounded by total size in bytes, from
+     which the least recently used files are evicted
+
+To use, create a cache and render pages through it:
+
+  -- cache = RenderCache(max_items=64, cache_dir=None,
+                         max_disk_bytes=256 * 1024 * 1024)
+  -- data = cache.render(page)
+
+Files in the on-disk tier are named by their keys, and other files in
+the cache directory are left alone. CACHE_VERSION is part of every
+key, and must be increased whenever a change to the drawing code
+changes the output for the same input, so that drawings cached by
+earlier versions are not reused.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# Version of the drawing output, part of every cache key
+
+CACHE_VERSION = 1
+
+# Names of files in the on-disk tier, as returned by page_key()
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+def page_key(page):
+
+    """
+    Returns a canonical hash identifying the output of a drawing page.
+
+    The drawing date is part of the drawing information, so cached
+    drawings are naturally not reused once the date changes. The
+    drawing scale is excluded, since it is calculated while drawing.
+    CACHE_VERSION is included, so that keys change with the output.
+
+    Arguments:
+    page -- a DrawingPage instance
+    """
+
+    info = dict((k, v.value) for k, v in page.drg_info.items()
+                if k != "scale")
+    spec = {"version": CACHE_VERSION,
+            "component": page.component.__class__.__name__,
+            "params": page.component.params,
+            "otype": page.output_type,
+            "osize": page.output_size,
+            "client": page.client,
+            "info": info}
+    data = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+
+    """
+    Class to cache the rendered output of drawing pages.
+
+    Instances may be shared between threads.
+
+    Public methods:
+    __init__()
+    render()
+    get()
+    put()
+    """
+
+    def __init__(self, max_items=64, cache_dir=None,
+                 max_disk_bytes=256 * 1024 * 1024):
+
+        """
+        Initializes a RenderCache instance.
+
+        Arguments:
+        max_items -- maximum number of drawings held in memory
+        cache_dir -- directory for the on-disk tier, or None to
+        cache in memory only. The directory is created if necessary.
+        max_disk_bytes -- maximum total size of the on-disk tier
+        """
+
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Running total size of the on-disk tier, counted when the
+        # first file is stored, and recounted whenever it appears
+        # to be over the limit, since other processes may share
+        # the directory.
+
+        self.disk_bytes = None
+        self.disk_lock = threading.Lock()
+
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def render(self, page, timer=None):
+
+        """
+        Returns the rendered output of a drawing page as bytes.
+
+        The page is only drawn if its output is not already cached.
+
+        Arguments:
+        page -- a DrawingPage instance
+        timer -- optional jobcalc.timing.StageTimer instance, which
+        records the stages of the drawing if the page is drawn
+        """
+
+        key = page_key(page)
+        data = self.get(key)
+
+        if data is None:
+            data = page.draw_bytes(timer)
+            self.put(key, data)
+
+        return data
+
+    def get(self, key):
+
+        """
+        Returns cached bytes for a key, or None if not cached.
+
+        Arguments:
+        key -- a key returned from page_key()
+        """
+
+        with self.lock:
+            data = self.memory.pop(key, None)
+            if data is not None:
+                self.memory[key] = data
+                return data
+
+        data = self.disk_get(key)
+        if data is not None:
+            self.memory_put(key, data)
+
+        return data
+
+    def put(self, key, data):
+
+        """
+        Stores bytes for a key in both cache tiers.
+
+        Arguments:
+        key -- a key returned from page_key()
+        data -- the rendered bytes
+        """
+
+        self.memory_put(key, data)
+        self.disk_put(key, data)
+
+    def memory_put(self, key, data):
+
+        """
+        Stores bytes in the memory tier, evicting the least
+        recently used entries if it is full.
+        """
+
+        with self.lock:
+            self.memory.pop(key, None)
+            self.memory[key] = data
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def disk_get(self, key):
+
+        """
+        Returns bytes from the disk tier, or None if not present.
+
+        Reading a file updates its modification time, which is used
+        to decide which files to evict.
+        """
+
+        if not self.cache_dir:
+            return None
+
+        path = os.path.join(self.cache_dir, key)
+
+        try:
+            with open(path, "rb") as infile:
+                data = infile.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+
+        return data
+
+    def disk_put(self, key, data):
+
+        """
+        Stores bytes in the disk tier and evicts old files if the
+        running total shows it has grown past its size limit.
+        """
+
+        if not self.cache_dir or len(data) > self.max_disk_bytes:
+            return
+
+        # Write to a temporary file and rename it into place, so
+        # that concurrent readers never see a partial file.
+
+        path = os.path.join(self.cache_dir, key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+
+        fd, tmppath = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(data)
+        os.rename(tmppath, path)
+
+        with self.disk_lock:
+            if self.disk_bytes is None:
+                evict = True
+            else:
+                self.disk_bytes += len(data) - replaced
+                evict = self.disk_bytes > self.max_disk_bytes
+
+        if evict:
+            self.disk_evict()
+
+    def disk_evict(self):
+
+        """
+        Counts the size of the disk tier, and removes least recently
+        used files until it is within the limit.
+
+        Only files named like cache keys are counted or removed.
+        """
+
+        with self.disk_lock:
+            entries = []
+            total = 0
+
+            for name in os.listdir(self.cache_dir):
+                if not KEY_PATTERN.match(name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+
+            entries.sort()
+
+            for mtime, size, name in entries:       # pylint: disable=W0612
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+                total -= size
+
+            self.disk_bytes = total
@@ -8,8 +8,10 @@ Defines a base class for drawn jobs.
 # All rights reserved.
 
 
+import copy
 import cairo
 from jobcalc.helper import draw_text_box, Point, TextInfo
+from jobcalc.timing import stage
 
 
 class DrawnComponent:
@@ -24,6 +26,7 @@ class DrawnComponent:
     Public methods:
     __init__()
     draw()
+    draw_preview()
     """
 
     def __init__(self):
@@ -35,11 +38,18 @@ class DrawnComponent:
         own constructor function.
         """
 
+        # Construction parameters, used to identify a component
+        # independently of its drawing state. Subclasses should add
+        # their own constructor arguments.
+
+        self.params = {}
+
         # Drawing attributes
 
         self.scale = 1
         self.drawing_line_width = 0.5
         self.drawing_line_color = (0, 0, 0)
+        self.preview_line_width = 1.0
         self.hatching = False
 
         # Text objects and styles common to all components
@@ -106,20 +116,101 @@ class DrawnComponent:
         then used to show the scale on the page.
         """
 
+        # Draw a shallow copy of the component. set_scale() replaces,
+        # rather than changes, the values it scales, so the component
+        # itself is left unchanged, and can be drawn again, or drawn
+        # from several threads at once.
+
+        component = copy.copy(self)
+
         ctx.save()
 
-        self.draw_pre_scale(ctx, page_w, page_h)
+        with stage("draw_pre_scale"):
+            component.draw_pre_scale(ctx, page_w, page_h)
 
-        self.set_scale(ctx, page_w, page_h)
+        with stage("set_scale"):
+            component.set_scale(ctx, page_w, page_h)
 
-        ctx.set_source_rgb(*self.drawing_line_color)
-        ctx.set_line_width(self.drawing_line_width)
+        ctx.set_source_rgb(*component.drawing_line_color)
+        ctx.set_line_width(component.drawing_line_width)
+
+        with stage("draw_component"):
+            component.draw_component(ctx, page_w, page_h)
+
+        ctx.restore()
+
+        return component.scale
+
+    def draw_preview(self, ctx, width, height):
+
+        """
+        Draws a quick preview of the component's outline only.
+
+        No text is measured or drawn, and no dimensions, so the
+        preview is much faster to draw than the full component. The
+        outline is scaled from its own bounding box to fit, and is
+        centered in, the preview area.
+
+        Arguments:
+        ctx -- a Pycairo context
+        width, height -- width and height of the preview area
+
+        Returns the scale factor of the preview, or None if the
+        component has no outline.
+        """
+
+        ctx.save()
+
+        ctx.new_path()
+        self.outline_path(ctx)
+        x_1, y_1, x_2, y_2 = ctx.path_extents()
+        ctx.new_path()
+
+        if x_2 <= x_1 or y_2 <= y_1:
+            ctx.restore()
+            return None
+
+        scale = min(width / (x_2 - x_1), height / (y_2 - y_1))
 
-        self.draw_component(ctx, page_w, page_h)
+        ctx.translate(width / 2.0, height / 2.0)
+        ctx.scale(scale, scale)
+        ctx.translate(-(x_1 + x_2) / 2.0, -(y_1 + y_2) / 2.0)
+
+        ctx.set_source_rgb(*self.drawing_line_color)
+        ctx.set_line_width(self.preview_line_width / scale)
+        self.draw_outline(ctx)
 
         ctx.restore()
 
-        return self.scale
+        return scale
+
+    def outline_path(self, ctx):
+
+        """
+        Adds the outline of the component to the current path, for
+        finding its bounding box.
+
+        Subclasses should override this if they can be previewed.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        pass
+
+    def draw_outline(self, ctx):
+
+        """
+        Draws the outline of the component, unscaled, for a preview.
+
+        Subclasses should override this if they can be previewed.
+        Line widths are already set for the preview scale.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        pass
 
     def draw_pre_scale(self, ctx, page_w, page_h):
 
@@ -141,6 +232,10 @@ class DrawnComponent:
         their own. 'page_h' and 'page_w' should already have been
         up-scaled by the time this happens and we get here.
 
+        Scaled values must be replaced with new objects, rather than
+        changed in place, since draw() scales a shallow copy of the
+        component which shares its lists and dictionaries.
+
         Arguments:
         ctx -- a Pycairo context
         page_w, page_h -- height and width of the drawing area
@@ -148,14 +243,12 @@ class DrawnComponent:
 
         # Upscale dash style
 
-        for dims in range(len(self.dash_style)):
-            self.dash_style[dims] /= self.scale
+        self.dash_style = [dash / self.scale for dash in self.dash_style]
 
         # Upscale fonts
 
-        for key in self.text.iterkeys():
-            self.text[key].size /= self.scale
-            self.text[key].padding /= self.scale
+        self.text = dict((key, info.scaled(self.scale))
+                         for key, info in self.text.items())
 
         # Upscale lines
 
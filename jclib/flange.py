@@ -8,6 +8,7 @@ Provides a class for describing and drawing standard pipe flanges.
 # All rights reserved.
 
 
+import cairo
 from jobcalc.helper import ptoc, Point
 from math import pi
 
@@ -17,6 +18,9 @@ class Flange:
     """
     Flange class to hold standard flange dimensions.
 
+    Flange paths are compiled once per flange standard and shared
+    between instances.
+
     Public methods:
     __init__()
     draw()
@@ -34,6 +38,7 @@ class Flange:
               "line":   (0.0, 0.0, 0.0),
               "arc":    (1.0, 1.0, 1.0)}
     bolt_hole_line_size = 1.5
+    paths = {}
 
     def __init__(self, name):
 
@@ -73,72 +78,141 @@ class Flange:
         drawing the bolt hole circle
         """
 
+        paths = self.get_paths()
+
         ctx.save()
         ctx.translate(*cfp.t())
         ctx.rotate(-angle)
 
-        for reverse in [True, False]:
-            self.draw_cross_section(ctx, reverse)
+        ctx.append_path(paths["section"])
+        ctx.set_source_rgb(*Flange.colors["section"])
+        ctx.fill_preserve()
+        ctx.set_source_rgb(*Flange.colors["line"])
+        ctx.stroke()
 
         if profile:
-            self.draw_profile(ctx, dash_style)
+            self.draw_profile(ctx, paths, dash_style)
 
         ctx.restore()
 
-    def draw_cross_section(self, ctx, rev=False):
+    def get_paths(self):
+
+        """
+        Returns the compiled paths for this flange standard.
 
+        The paths are built once per flange standard, in the flange's
+        own coordinates, and are then appended to the drawing under
+        the current transformation.
         """
-        Draws a flange half cross section.
+
+        paths = Flange.paths.get(self.name)
+
+        if paths is None:
+
+            # Paths are built on a scratch context with a low
+            # tolerance, so that arcs remain smooth when drawn
+            # at larger scales.
+
+            ctx = cairo.Context(cairo.ImageSurface(cairo.FORMAT_A8, 1, 1))
+            ctx.set_tolerance(0.01)
+            paths = {}
+
+            for name, build in [("section", self.build_cross_section),
+                                ("profile", self.build_profile),
+                                ("raised_face", self.build_raised_face),
+                                ("holes", self.build_bolt_holes),
+                                ("hole_lines", self.build_bolt_hole_lines),
+                                ("bolt_circle", self.build_bolt_circle),
+                                ("center_line", self.build_center_line)]:
+                build(ctx)
+                paths[name] = ctx.copy_path()
+                ctx.new_path()
+
+            Flange.paths[self.name] = paths
+
+        return paths
+
+    def draw_profile(self, ctx, paths, dash_style):
+
+        """
+        Draws the flange arcs, including bolt holes.
 
         Arguments:
         ctx -- a Pycairo context
-        rev -- set to True to draw the reverse cross section half
+        paths -- the compiled paths returned by get_paths()
+        dash_style -- style of dashes to use to the bolt
+        hole diameter
         """
 
-        rfr = self.raised_face_diameter / 2.0
-        hrd = self.hole_diameter / 2.0
-        frd = self.flange_diameter / 2.0
-        fth = self.flange_thickness
-        rfh = self.raised_face_height
-        rev = -1 if rev else 1
-
         ctx.save()
 
-        ctx.move_to(hrd * rev, 0)
-        for cdx, cdy in [(rfr, 0), (rfr, rfh), (frd, rfh),
-                         (frd, fth), (hrd, fth)]:
-            ctx.line_to(cdx * rev, -cdy)
-        ctx.close_path()
+        # Draw flange arcs
 
-        ctx.set_source_rgb(*Flange.colors["section"])
+        ctx.append_path(paths["profile"])
+        ctx.set_source_rgb(*Flange.colors["arc"])
         ctx.fill_preserve()
         ctx.set_source_rgb(*Flange.colors["line"])
         ctx.stroke()
 
+        ctx.append_path(paths["raised_face"])
+        ctx.stroke()
+
+        # Draw bolt holes
+
+        ctx.append_path(paths["holes"])
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.fill_preserve()
+        ctx.append_path(paths["hole_lines"])
+        ctx.set_source_rgb(*Flange.colors["line"])
+        ctx.stroke()
+
+        # Draw bolt hole circle arc
+
+        if dash_style:
+            ctx.set_dash(dash_style)
+        ctx.append_path(paths["bolt_circle"])
+        ctx.stroke()
+
+        # Extend center line arc to flange hole diameter
+
+        ctx.append_path(paths["center_line"])
+        ctx.stroke()
+
         ctx.restore()
 
-    def draw_profile(self, ctx, dash_style):
+    def build_cross_section(self, ctx):
 
         """
-        Draws the flange arcs, including bolt holes.
+        Builds the path for both flange half cross sections.
 
         Arguments:
         ctx -- a Pycairo context
-        dash_style -- style of dashes to use to the bolt
-        hole diameter
         """
 
         rfr = self.raised_face_diameter / 2.0
         hrd = self.hole_diameter / 2.0
         frd = self.flange_diameter / 2.0
-        bcr = self.bolt_circle_diameter / 2.0
-        bhr = self.bolt_hole_diameter / 2.0
-        nbs = self.num_bolts / 2
-        hls = Flange.bolt_hole_line_size
+        fth = self.flange_thickness
+        rfh = self.raised_face_height
 
-        ctx.save()
+        for rev in [-1, 1]:
+            ctx.move_to(hrd * rev, 0)
+            for cdx, cdy in [(rfr, 0), (rfr, rfh), (frd, rfh),
+                             (frd, fth), (hrd, fth)]:
+                ctx.line_to(cdx * rev, -cdy)
+            ctx.close_path()
 
-        # Draw flange arcs
+    def build_profile(self, ctx):
+
+        """
+        Builds the path for the outline of the flange profile.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        hrd = self.hole_diameter / 2.0
+        frd = self.flange_diameter / 2.0
 
         ctx.move_to(hrd, 0)
         ctx.line_to(frd, 0)
@@ -147,40 +221,73 @@ class Flange:
         ctx.arc_negative(0, 0, hrd, pi, 0)
         ctx.close_path()
 
-        ctx.set_source_rgb(*Flange.colors["arc"])
-        ctx.fill_preserve()
-        ctx.set_source_rgb(*Flange.colors["line"])
-        ctx.stroke()
+    def build_raised_face(self, ctx):
 
-        ctx.arc(0, 0, rfr, 0, pi)
-        ctx.stroke()
+        """
+        Builds the path for the raised face arc.
 
-        # Draw bolt holes
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        ctx.arc(0, 0, self.raised_face_diameter / 2.0, 0, pi)
+
+    def build_bolt_holes(self, ctx):
+
+        """
+        Builds the path for the bolt hole circles.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        bcr = self.bolt_circle_diameter / 2.0
+        bhr = self.bolt_hole_diameter / 2.0
+        nbs = self.num_bolts // 2
 
         for i in range(nbs):
-            ang = -pi / (nbs * 2) * (1 + i * 2)
-            bhc = ptoc(ang, bcr)
+            bhc = ptoc(-pi / (nbs * 2) * (1 + i * 2), bcr)
+            ctx.new_sub_path()
             ctx.arc(bhc.x, bhc.y, bhr, 0, pi * 2)
-            ctx.set_source_rgb(1, 1, 1)
-            ctx.fill_preserve()
 
-            ctx.set_source_rgb(*Flange.colors["line"])
+    def build_bolt_hole_lines(self, ctx):
+
+        """
+        Builds the path for the center lines through the bolt holes.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        bcr = self.bolt_circle_diameter / 2.0
+        bhr = self.bolt_hole_diameter / 2.0
+        nbs = self.num_bolts // 2
+        hls = Flange.bolt_hole_line_size
+
+        for i in range(nbs):
+            ang = -pi / (nbs * 2) * (1 + i * 2)
             ctx.move_to(*ptoc(ang, bcr - bhr * hls).t())
             ctx.line_to(*ptoc(ang, bcr + bhr * hls).t())
 
-            ctx.stroke()
+    def build_bolt_circle(self, ctx):
 
-        # Draw bolt hole circle arc
+        """
+        Builds the path for the bolt hole circle arc.
 
-        if dash_style:
-            ctx.set_dash(dash_style)
-        ctx.arc(0, 0, bcr, 0, pi)
-        ctx.stroke()
+        Arguments:
+        ctx -- a Pycairo context
+        """
 
-        # Extend center line arc to flange hole diameter
+        ctx.arc(0, 0, self.bolt_circle_diameter / 2.0, 0, pi)
 
-        ctx.move_to(0, 0)
-        ctx.line_to(0, 0 + hrd)
-        ctx.stroke()
+    def build_center_line(self, ctx):
 
-        ctx.restore()
+        """
+        Builds the path extending the center line to the flange hole.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        ctx.move_to(0, 0)
+        ctx.line_to(0, self.hole_diameter / 2.0)
@@ -0,0 +1,104 @@
+"""
+Provides functions for creating drawing pages from HTML form input.
+
+The functions in this module are shared by the CGI and WSGI entry
+points and the batch renderer. Form objects need only provide the
+getvalue() and getlist() methods of cgi.FieldStorage, and DictForm
+provides these for dictionaries of field values.
+
+Form input is validated by jobcalc.jobspec. The drawing classes, and
+so Pycairo, are only imported once form input has passed validation,
+so that bad input fails fast.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+# Disable pylint warning for unused imports, which are re-exported
+# from jobcalc.jobspec.
+# pylint: disable=W0611
+
+
+from jobcalc.jobspec import JOBTYPES, CTYPES, FLANGES, OTYPES, OSIZES
+from jobcalc.jobspec import FormError, DictForm, validate_job
+
+
+CONTENT_TYPES = {"pdf": "application/pdf",
+                 "svg": "image/svg+xml",
+                 "png": "image/png"}
+
+
+def component_from_spec(spec):
+
+    """
+    Creates a component from a validated job specification.
+
+    Arguments:
+    spec -- a job specification returned from
+    jobcalc.jobspec.validate_job()
+    """
+
+    # The drawing classes are imported here, rather than with the
+    # module, so that validation does not have to wait for Pycairo
+    # to load.
+
+    from jobcalc.pipestraight import PipeStraight
+    from jobcalc.pipebend import PipeBend
+
+    if spec["jobtype"] == "pipebend":
+        return PipeBend(nomrad=spec["nomrad"], casingod=spec["casingod"],
+                        casingid=spec["casingid"], liningod=spec["liningod"],
+                        liningid=spec["liningid"],
+                        bendangle=spec["bendangle"],
+                        segangle=spec["segangle"], ctype=spec["casing"],
+                        exdimdrg=spec["exdimdrg"], exdimbox=spec["exdimbox"],
+                        flange=spec["flange"])
+    elif spec["jobtype"] == "pipestraight":
+        return PipeStraight(casingod=spec["casingod"],
+                            casingid=spec["casingid"],
+                            liningod=spec["liningod"],
+                            liningid=spec["liningid"],
+                            length=spec["length"], flange=spec["flange"])
+
+
+def page_from_spec(spec):
+
+    """
+    Creates a drawing page from a validated job specification.
+
+    Arguments:
+    spec -- a job specification returned from
+    jobcalc.jobspec.validate_job()
+    """
+
+    from jobcalc.page import DrawingPage
+
+    return DrawingPage(otype=spec["output"],
+                       component=component_from_spec(spec),
+                       osize=spec["outputsize"], title=spec["title"],
+                       projno=spec["projno"], drgno=spec["drgno"],
+                       qty=spec["qty"], customer=spec["customer"],
+                       finish=spec["finish"],
+                       servicetemp=spec["servicetemp"],
+                       bonding=spec["bonding"], material=spec["material"],
+                       checkedby=spec["checkedby"])
+
+
+def page_from_form(form):
+
+    """
+    Validates form input and creates a drawing page from it.
+
+    Returns a (page, output) tuple, where 'page' is a DrawingPage
+    instance ready to be drawn, and 'output' is the requested output
+    type. Raises FormError if the input is invalid.
+
+    Arguments:
+    form -- a form object returned from cgi.FieldStorage(), or a
+    dictionary of field values
+    """
+
+    spec = validate_job(form)
+    return (page_from_spec(spec), spec["output"])
@@ -0,0 +1,431 @@
+"""
+Provides geometry classes and functions for JobCalc components.
+
+This module does not depend on Pycairo, so it can be used to quote for
+jobs, e.g. from the segment dimensions of a bend, without creating a
+drawn component. The drawn component classes use it for their own
+geometry.
+
+The following classes are provided:
+
+  -- Point(x, y)
+  -- BendGeometry(nomrad, casingod, casingid, liningod,
+                  liningid, bendangle, segangle)
+
+along with the following functions:
+
+  -- ptoc(theta, r, p)
+  -- segment_length(radius, segment_angle)
+  -- count_segments(bendangle, segangle)
+  -- bulk_segment_dims(nomrad, casingod, liningod, bendangle, segangle)
+  -- find_segment_angles(nomrad, casingod, liningod, bendangle, limits)
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+# Disable pylint warnings for:
+#  - short variable names, as they are commonly used in this module
+#  - too many arguments, a potential future refactor
+#  - too many instance attributes, a potential future refactor
+#
+# pylint: disable=C0103
+# pylint: disable=R0913
+# pylint: disable=R0902
+
+
+from math import radians, sin, cos, tan
+from operator import itemgetter
+from itertools import repeat
+from array import array
+from collections import namedtuple
+from numbers import Real
+
+
+# A candidate segment angle for a bend, as returned by
+# find_segment_angles(). 'segdims' is a dictionary with the same
+# keys as BendGeometry.segdims.
+
+SegmentCandidate = namedtuple("SegmentCandidate",
+                              ["segangle", "num_segments", "segdims"])
+
+
+class Point(tuple):
+
+    """
+    Class to hold a cartesian coordinate.
+
+    Points are immutable (x, y) tuples without an instance dictionary,
+    to keep the many points held by segmented components small.
+
+    Public methods:
+    __new__()
+    t()
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, x, y):
+
+        """
+        Creates a Point instance.
+        """
+
+        return tuple.__new__(cls, (x, y))
+
+    def __getnewargs__(self):
+
+        """
+        Returns the arguments for __new__(), so that points can be
+        copied and pickled.
+        """
+
+        return tuple(self)
+
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
+
+    def t(self):
+
+        """
+        Returns the coordinates as a tuple.
+
+        Provided so that the coordinates can be unpacked using the
+        '*' operator and passed to a function expecting two
+        arguments. Since a Point is already a tuple, no new tuple
+        is created.
+        """
+
+        return self
+
+
+def ptoc(theta, r, p=Point(0, 0)):
+
+    """
+    Returns cartesian coordinates for polar coordinates.
+
+    Note: as normal for graphics, this assumes an inverse y-axis
+    compared to regular cartesian coordinates, i.e. y increases
+    in the downwards rather than upwards direction.
+
+    Arguments:
+    theta -- theta coordinate, in radians, 0 is right along the x-axis,
+    with angles increasing counter-clockwise.
+    r -- r coordinate.
+    p -- optional Point instance coordinates for the origin, default to zero.
+    """
+
+    return Point(p.x + cos(theta) * r, p.y - sin(theta) * r)
+
+
+def segment_length(radius, segment_angle):
+
+    """
+    Returns the length of a bend segment at a specified radius.
+
+    Arguments:
+    radius -- the radius, to the segment mid-point
+    segment_angle -- the segment angle, in radians
+    """
+
+    return radius * tan(segment_angle / 2) * 2
+
+
+def count_segments(bendangle, segangle):
+
+    """
+    Returns the number of segments in a bend.
+
+    Angles are counted exactly in hundredths of a degree, the
+    precision the HTML form allows, rather than by dividing floating
+    point radians, which can come out one segment short, e.g. for a
+    9 degree bend with 3 degree segments.
+
+    Arguments:
+    bendangle -- angle, in degrees, of overall bend
+    segangle -- angle, in degrees, of each bend segment
+    """
+
+    return int(round(bendangle * 100)) // int(round(segangle * 100))
+
+
+class BendGeometry(object):
+
+    """
+    Class to calculate the geometry of a segmented pipe bend.
+
+    Each value is calculated when it is first used, so creating an
+    instance is cheap, and only the values needed are calculated.
+
+    Public attributes:
+    bendangle -- angle of overall bend, in degrees
+    segangle -- angle of each segment, in degrees
+    bend_arc -- angle of overall bend, in radians
+    segment_angle -- angle of each segment, in radians
+    num_segments -- number of segments
+    radii -- dictionary of "inner" and "outer" dictionaries of
+    radii for the "nom", "co", "ci", "lo" and "li" components,
+    and the nominal radius under "nom"
+    segdims -- dictionary of segment lengths, "cex", "cin", "lex",
+    "lin" and "mean", for the casing and lining extrados and
+    intrados and the mean segment length
+    segment_table -- list of unit coordinates of segment vertices
+
+    Public methods:
+    __init__()
+    get_segment_points()
+    """
+
+    segdim_keys = ["cex", "cin", "lex", "lin", "mean"]
+
+    def __init__(self, nomrad, casingod, casingid, liningod,
+                 liningid, bendangle, segangle):
+
+        """
+        Initializes a BendGeometry instance.
+
+        Arguments:
+        nomrad -- nominal radius, in mm
+        casingod -- outside diameter of casing, in mm
+        casingid -- inside diameter of casing, in mm
+        liningod -- outside diameter of lining, in mm
+        liningid -- inside diameter of lining, in mm
+        bendangle -- angle, in degrees, of overall bend
+        segangle -- angle, in degrees, of each bend segment
+        """
+
+        self.nomrad = nomrad
+        self.diameters = {"co": casingod, "ci": casingid,
+                          "lo": liningod, "li": liningid}
+        self.bendangle = bendangle
+        self.segangle = segangle
+        self.bend_arc = radians(bendangle)
+        self.segment_angle = radians(segangle)
+
+        self._num_segments = None
+        self._radii = None
+        self._segdims = None
+        self._segment_table = None
+
+    @property
+    def num_segments(self):
+
+        """
+        Returns the number of segments in the bend.
+        """
+
+        if self._num_segments is None:
+            self._num_segments = count_segments(self.bendangle,
+                                                self.segangle)
+        return self._num_segments
+
+    @property
+    def radii(self):
+
+        """
+        Returns the inner and outer radii of the bend components.
+        """
+
+        if self._radii is None:
+            nomrad = self.nomrad
+            outer_radii = {"nom": nomrad}
+            inner_radii = {"nom": nomrad}
+            for k, d in self.diameters.items():
+                outer_radii[k] = nomrad + d / 2.0
+                inner_radii[k] = nomrad - d / 2.0
+            self._radii = {"inner": inner_radii,
+                           "outer": outer_radii,
+                           "nom": nomrad}
+        return self._radii
+
+    @property
+    def segdims(self):
+
+        """
+        Returns the segment extrados and intrados lengths.
+        """
+
+        if self._segdims is None:
+            s_ang = self.segment_angle
+            segdims = {}
+            for k, i, d in zip(self.segdim_keys,
+                               ["outer", "inner", "outer", "inner", "outer"],
+                               ["co", "co", "lo", "lo", "nom"]):
+                segdims[k] = segment_length(self.radii[i][d], s_ang)
+            self._segdims = segdims
+        return self._segdims
+
+    @property
+    def segment_table(self):
+
+        """
+        Returns unit coordinates for segment vertices.
+
+        Returns a list of (x, y) tuples which, multiplied by a radius,
+        give the coordinates of the segment vertices at that radius.
+        """
+
+        # Note that the nominal radius of the bend is calculated to the
+        # center of the segment at its mid-point, not at its end. If this
+        # were not so, the midpoint of the bend ends would not align with the
+        # nominal radius, as the bend is always ended with half segments.
+        # Since we are calculating coordinates for the segment vertices
+        # at the ends, and not for the mid-points, we cannot use the
+        # nominal radius to do this. Instead, we use the 'emul' variable
+        # which calculates the multiplier we need to apply to the radius
+        # for the segment vertices that will cause the segment mid-points
+        # to align with the nominal radius.
+
+        # Contrast this with calculating the segment intrados and
+        # extrados lengths, in segment_length(), where we do use
+        # the nominal radius, but calculate a tangent. This
+        # is not available here due to the vertex coordinates needing
+        # a radius to the end points, rather than to the mid point.
+
+        if self._segment_table is None:
+            s_ang = self.segment_angle
+            emul = 1 / cos(s_ang / 2)
+
+            angs = [(0, 1)]
+            for ang in [n + 0.5 for n in range(self.num_segments)]:
+                angs.append((s_ang * ang, emul))
+            angs.append((self.bend_arc, 1))
+
+            self._segment_table = [(cos(ang) * mul, -sin(ang) * mul)
+                                   for ang, mul in angs]
+        return self._segment_table
+
+    def get_segment_points(self, rad):
+
+        """
+        Calculates coordinates for segment vertices at a specified radius.
+
+        Arguments:
+        rad -- the radius, to the segment mid-points
+        """
+
+        return [Point(ux * rad, uy * rad) for ux, uy in self.segment_table]
+
+
+def bulk_segment_dims(nomrad, casingod, liningod, bendangle, segangle):
+
+    """
+    Calculates segment dimensions for many bends at once.
+
+    Each argument is either an iterable with one value per bend, or a
+    single number used for every bend. All iterables must be the same
+    length. Only the outside diameters are needed, since the segment
+    dimensions are measured on the outside of the casing and lining.
+
+    Returns a dictionary of arrays of floats, with the same keys as
+    BendGeometry.segdims, plus an array of integers under
+    "num_segments". The values are the same as BendGeometry would
+    calculate for each bend.
+
+    Arguments:
+    nomrad -- nominal radii, in mm
+    casingod -- outside diameters of casing, in mm
+    liningod -- outside diameters of lining, in mm
+    bendangle -- angles, in degrees, of overall bends
+    segangle -- angles, in degrees, of bend segments
+    """
+
+    # Numbers are used for every bend, and anything else is read
+    # into a list, so that any iterable, such as a generator, can
+    # be passed.
+
+    args = []
+    for arg in [nomrad, casingod, liningod, bendangle, segangle]:
+        if isinstance(arg, Real):
+            args.append(arg)
+        else:
+            try:
+                args.append(list(arg))
+            except TypeError:
+                raise TypeError("bulk_segment_dims() arguments must be "
+                                "numbers or iterables of numbers, "
+                                "not %s" % arg.__class__.__name__)
+
+    lengths = set(len(a) for a in args if isinstance(a, list))
+    if len(lengths) > 1:
+        raise ValueError("bulk_segment_dims() sequences differ in length")
+    num = lengths.pop() if lengths else 1
+    args = [a if isinstance(a, list) else repeat(a, num) for a in args]
+
+    cex, cin, lex, lin, mean, segs = [], [], [], [], [], []
+
+    for nom, cod, lod, bang, sang in zip(*args):
+        s_ang = radians(sang)
+        hc = cod / 2.0
+        hl = lod / 2.0
+        cex.append(segment_length(nom + hc, s_ang))
+        cin.append(segment_length(nom - hc, s_ang))
+        lex.append(segment_length(nom + hl, s_ang))
+        lin.append(segment_length(nom - hl, s_ang))
+        mean.append(segment_length(nom, s_ang))
+        segs.append(count_segments(bang, sang))
+
+    return {"cex": array("d", cex), "cin": array("d", cin),
+            "lex": array("d", lex), "lin": array("d", lin),
+            "mean": array("d", mean), "num_segments": array("l", segs)}
+
+
+def find_segment_angles(nomrad, casingod, liningod, bendangle, limits=None):
+
+    """
+    Finds the valid segment angles for a bend which meet some limits.
+
+    Valid segment angles are those, to two decimal places, which
+    divide exactly into the bend angle, as the HTML form requires.
+    All of them are evaluated in a single call to bulk_segment_dims().
+
+    Returns a list of SegmentCandidate tuples for the segment angles
+    within the limits, ordered by number of segments, fewest first,
+    since each segment adds fabrication work.
+
+    Arguments:
+    nomrad -- nominal radius, in mm
+    casingod -- outside diameter of casing, in mm
+    liningod -- outside diameter of lining, in mm
+    bendangle -- angle, in degrees, of overall bend
+    limits -- optional dictionary of (minimum, maximum) tuples keyed
+    by "num_segments" or a BendGeometry.segdims key, e.g.
+    {"lin": (50, None), "num_segments": (None, 12)}. Either end of
+    a range may be None for no limit.
+    """
+
+    # Segment angles are whole divisors of the bend angle in
+    # hundredths of a degree.
+
+    hundredths = int(round(bendangle * 100))
+    divisors = set()
+    n = 1
+    while n * n <= hundredths:
+        if hundredths % n == 0:
+            divisors.update([n, hundredths // n])
+        n += 1
+
+    segangles = [d / 100.0 for d in sorted(divisors)]
+    dims = bulk_segment_dims(nomrad, casingod, liningod,
+                             bendangle, segangles)
+
+    candidates = []
+
+    for i, segangle in enumerate(segangles):
+        ok = True
+        for key, (low, high) in (limits or {}).items():
+            value = dims[key][i]
+            if (low is not None and value < low or
+                    high is not None and value > high):
+                ok = False
+                break
+        if ok:
+            segdims = dict((k, dims[k][i]) for k in BendGeometry.segdim_keys)
+            candidates.append(SegmentCandidate(segangle,
+                                               dims["num_segments"][i],
+                                               segdims))
+
+    candidates.sort(key=lambda c: c.num_segments)
+    return candidates
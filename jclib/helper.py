@@ -19,9 +19,24 @@ Provides some helper classes and functions for JobCalc.
 # pylint: disable=R0914
 
 
-from math import pi, sin, cos, atan, sqrt
+from math import pi, atan, sqrt
+from collections import OrderedDict
+import copy
+import threading
 import cairo
-import sys
+from jobcalc.geometry import Point, ptoc
+
+# HTML error functions, re-exported for existing callers
+
+from jobcalc.htmlerror import html_error, html_fail   # pylint: disable=W0611
+
+
+# Cache of text extents shared by all layout measurement, least
+# recently used entries being discarded when it is full.
+
+TEXT_EXTENTS_CACHE_SIZE = 4096
+text_extents_cache = OrderedDict()
+text_extents_lock = threading.Lock()
 
 
 ##############################
@@ -54,8 +69,13 @@ class TextInfo:
     """
     Class to hold text font and padding information.
 
+    Each instance holds a prepared Pycairo font face for its style,
+    which drawing code sets with ctx.set_font_face() in place of
+    looking the font up again with ctx.select_font_face().
+
     Public methods:
     __init()__
+    scaled()
     """
 
     def __init__(self, face="Arial", bold=False,
@@ -67,41 +87,30 @@ class TextInfo:
 
         self.face = (face, cairo.FONT_SLANT_NORMAL,
             cairo.FONT_WEIGHT_BOLD if bold else cairo.FONT_WEIGHT_NORMAL)
+        self.font_face = cairo.ToyFontFace(*self.face)
         self.size = size
         self.padding = padding
         self.color = color
 
+    def scaled(self, scale):
 
-class Point:
-
-    """
-    Class to hold a cartesian coordinate.
-
-    Public methods:
-    __init__()
-    t()
-    """
-
-    def __init__(self, x, y):
-
-        """
-        Initializes a Point instance.
         """
+        Returns a copy with the size and padding divided by a scale
+        factor, so that text keeps its size on a scaled context.
 
-        self.x = x
-        self.y = y
+        Arguments:
+        scale -- the scale factor
+        """
 
-    def t(self):
+        info = copy.copy(self)
+        info.size = self.size / scale
+        info.padding = self.padding / scale
+        return info
 
-        """
-        Returns the coordinates as a tuple.
 
-        Provided so that the coordinates can be unpacked using the
-        '*' operator and passed to a function expecting two
-        arguments.
-        """
+# Text style for dimension labels
 
-        return (self.x, self.y)
+DIM_TEXT = TextInfo()
 
 
 ##############################
@@ -120,23 +129,47 @@ def xnor(a, b):
     return bool(a) == bool(b)
 
 
-def ptoc(theta, r, p=Point(0, 0)):
+def get_text_extents(ctx, textinfo, text, size=None):
 
     """
-    Returns cartesian coordinates for polar coordinates.
+    Returns the extents of a string, as from ctx.text_extents().
 
-    Note: as normal for graphics, this assumes an inverse y-axis
-    compared to regular cartesian coordinates, i.e. y increases
-    in the downwards rather than upwards direction.
+    Extents are cached by font, size and string. Text measured with
+    metrics hinting, as on image surfaces, can vary with the current
+    transformation and surface type, so these are also part of the
+    key. The font of the context is left unchanged.
 
     Arguments:
-    theta -- theta coordinate, in radians, 0 is right along the x-axis,
-    with angles increasing counter-clockwise.
-    r -- r coordinate.
-    p -- optional Point instance coordinates for the origin, default to zero.
+    ctx -- a Pycairo context
+    textinfo -- a TextInfo instance with the font to measure in
+    text -- the string to measure
+    size -- font size, if other than the size of textinfo
     """
 
-    return Point(p.x + cos(theta) * r, p.y - sin(theta) * r)
+    if size is None:
+        size = textinfo.size
+
+    key = ((textinfo.face, size, text, ctx.get_target().__class__) +
+           tuple(ctx.get_matrix())[:4])
+
+    with text_extents_lock:
+        extents = text_extents_cache.pop(key, None)
+        if extents is not None:
+            text_extents_cache[key] = extents
+            return extents
+
+    ctx.save()
+    ctx.set_font_face(textinfo.font_face)
+    ctx.set_font_size(size)
+    extents = ctx.text_extents(text)
+    ctx.restore()
+
+    with text_extents_lock:
+        text_extents_cache[key] = extents
+        while len(text_extents_cache) > TEXT_EXTENTS_CACHE_SIZE:
+            text_extents_cache.popitem(last=False)
+
+    return extents
 
 
 def get_largest_text_width(ctx, labels, ti, padding=False):
@@ -151,23 +184,17 @@ def get_largest_text_width(ctx, labels, ti, padding=False):
     padding -- set to True to including padding in the returned width
     """
 
-    ctx.save()
-    ctx.select_font_face(*ti.face)
-    ctx.set_font_size(ti.size)
-
     max_w = 0
 
     # pylint: disable=W0612
 
     for l in labels:
-        (bx, by, w, h, dx, dy) = ctx.text_extents(l)
+        (bx, by, w, h, dx, dy) = get_text_extents(ctx, ti, l)
         if w > max_w:
             max_w = w
 
     # pylint: enable=W0612
 
-    ctx.restore()
-
     if padding:
         max_w += ti.padding * 2
 
@@ -186,23 +213,17 @@ def get_largest_text_height(ctx, labels, ti, padding=False):
     padding -- set to True to include padding in the returned height
     """
 
-    ctx.save()
-    ctx.select_font_face(*ti.face)
-    ctx.set_font_size(ti.size)
-
     max_h = 0
 
     # pylint: disable=W0612
 
     for l in labels:
-        (bx, by, w, h, dx, dy) = ctx.text_extents(l)
+        (bx, by, w, h, dx, dy) = get_text_extents(ctx, ti, l)
         if h > max_h:
             max_h = h
 
     # pylint: enable=W0612
 
-    ctx.restore()
-
     if padding:
         max_h += ti.padding * 2
 
@@ -314,8 +335,7 @@ def draw_dim_label(ctx, p, dim, scale, dp=0, opt=""):
     """
 
     margin = 3 / scale
-    font_face = "Arial"
-    font_size = 8.0 / scale
+    font_size = float(DIM_TEXT.size) / scale
 
     ctx.save()
     ctx.translate(*p.t())
@@ -327,13 +347,13 @@ def draw_dim_label(ctx, p, dim, scale, dp=0, opt=""):
 
     # Get text extents for dimension label
 
-    ctx.select_font_face(font_face, cairo.FONT_SLANT_NORMAL,
-                         cairo.FONT_WEIGHT_NORMAL)
+    ctx.set_font_face(DIM_TEXT.font_face)
     ctx.set_font_size(font_size)
 
     # pylint: disable=W0612
 
-    (bx, by, w, h, dx, dy) = ctx.text_extents(dim_str)
+    (bx, by, w, h, dx, dy) = get_text_extents(ctx, DIM_TEXT, dim_str,
+                                              font_size)
 
     # pylint: enable=W0612
 
@@ -356,7 +376,8 @@ def draw_dim_label(ctx, p, dim, scale, dp=0, opt=""):
     if opt.upper() == "D":
         ctx.set_font_size(font_size / 1.7)
         deg_str = "o"
-        (bx, by, w, h, dx, dy) = ctx.text_extents(deg_str)
+        (bx, by, w, h, dx, dy) = get_text_extents(ctx, DIM_TEXT, deg_str,
+                                                  font_size / 1.7)
         ctx.move_to(hw + margin / 2, h - hh)
         ctx.show_text(deg_str)
 
@@ -367,7 +388,8 @@ def draw_dim_label(ctx, p, dim, scale, dp=0, opt=""):
 
 def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
                   bottomleft=None, bottomright=None, centerpoint=None,
-                  width=None, fields=None, center=False, noborder=False):
+                  width=None, fields=None, center=False, noborder=False,
+                  nolabels=False, nofields=False):
 
     """
     Constructs a multi-row info box contains labels and values.
@@ -383,11 +405,17 @@ def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
     contains a single string
     center -- set to True to center the text in the box.
     noborder -- set to True to not draw a border around the box
+    nolabels -- set to True to not draw the labels
+    nofields -- set to True to not draw the values
+
+    The labels and values are always used to size the box, so a
+    box can be drawn in parts, e.g. once with 'nofields' and once
+    with 'noborder' and 'nolabels', at the same position.
     """
 
     ctx.save()
 
-    ctx.select_font_face(*textinfo.face)
+    ctx.set_font_face(textinfo.font_face)
     ctx.set_font_size(textinfo.size)
 
     label_w, field_w, row_h = 0, 0, 0
@@ -401,7 +429,7 @@ def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
 
         # pylint: disable=W0612
 
-        (bx, by, w, h, dx, dy) = ctx.text_extents(l)
+        (bx, by, w, h, dx, dy) = get_text_extents(ctx, textinfo, l)
 
         # pylint: enable=W0612
 
@@ -412,7 +440,7 @@ def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
 
     if fields:
         for f in fields:
-            (bx, by, w, h, dx, dy) = ctx.text_extents(f)
+            (bx, by, w, h, dx, dy) = get_text_extents(ctx, textinfo, f)
             if w > field_w:
                 field_w = w
             if h > row_h:
@@ -455,12 +483,12 @@ def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
 
     for i in range(nl):
         y = row_h * (i + 1)
-        if i < (nl - 1):
+        if i < (nl - 1) and not noborder:
             ctx.set_source_rgb(0, 0, 0)
             ctx.move_to(0, y)
             ctx.line_to(box_w, y)
             ctx.stroke()
-        (bx, by, w, h, dx, dy) = ctx.text_extents(labels[i])
+        (bx, by, w, h, dx, dy) = get_text_extents(ctx, textinfo, labels[i])
         y -= ifm
 
         # Centering currently only works for boxes without
@@ -473,36 +501,20 @@ def draw_text_box(ctx, textinfo, labels, topleft=None, topright=None,
         else:
             x = ifm
 
-        ctx.move_to(x, y)
         ctx.set_source_rgb(*textinfo.color)
-        ctx.show_text(labels[i])
+        if not nolabels:
+            ctx.move_to(x, y)
+            ctx.show_text(labels[i])
 
         if fields:
             x += label_w
             (fx, fy) = ctx.user_to_device(x, y)
             fps.append(Point(fx, fy))
-            ctx.move_to(x, y)
-            ctx.show_text(fields[i])
+            if not nofields:
+                ctx.move_to(x, y)
+                ctx.show_text(fields[i])
 
     ctx.restore()
 
     return (box_w, box_h, fps)
 
-
-def html_fail(msg):
-
-    """
-    Function to print basic HTML fallback page on error.
-
-    Arguments:
-    msg -- string of error message to output.
-    """
-
-    print("Content-type: text/html\n")
-
-    print("<html>\n<head><title>Error!</title></head>\n")
-    print("<body><h1>Error!</h1>\n")
-    print("<p>%s</p>\n" % msg)
-    print("</body>\n</html>\n")
-
-    sys.exit()
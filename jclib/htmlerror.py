@@ -0,0 +1,44 @@
+"""
+Provides functions for reporting errors as HTML pages.
+
+This module does not depend on Pycairo, so errors in form input can
+be reported without loading the drawing code.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import sys
+
+
+def html_error(msg):
+
+    """
+    Returns a basic HTML fallback page for an error.
+
+    Arguments:
+    msg -- string of error message to output.
+    """
+
+    return ("<html>\n<head><title>Error!</title></head>\n\n" +
+            "<body><h1>Error!</h1>\n\n" +
+            "<p>%s</p>\n\n" % msg +
+            "</body>\n</html>\n")
+
+
+def html_fail(msg):
+
+    """
+    Function to print basic HTML fallback page on error.
+
+    Arguments:
+    msg -- string of error message to output.
+    """
+
+    print("Content-type: text/html\n")
+    print(html_error(msg))
+
+    sys.exit()
@@ -0,0 +1,168 @@
+"""
+Provides a report of the time taken to import JobCalc modules.
+
+Each module is imported in a fresh Python interpreter, so that the
+report shows the cold start cost a CGI script would pay. For each
+module the report shows the import time, the number of modules
+loaded, and whether Pycairo was loaded. On Python 3.7 and later, the
+slowest imports are also listed, from the interpreter's own
+"-X importtime" output.
+
+To use:
+
+  -- python -m jobcalc.importtime [--top N] [--json] [MODULE ...]
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import sys
+import json
+import argparse
+import subprocess
+
+
+# Modules reported on by default, in the order the CGI and WSGI
+# entry points import them.
+
+DEFAULT_MODULES = ["jobcalc", "jobcalc.form", "jobcalc.wsgi", "jobcalc.page"]
+
+# Script run in the fresh interpreter, printing its results as JSON
+# on the last line of its output.
+
+PROBE = """
+import sys
+from timeit import default_timer
+before = set(sys.modules)
+start = default_timer()
+__import__(%r)
+secs = default_timer() - start
+loaded = sorted(set(sys.modules) - before)
+sys.stderr.write("%s\\n")
+import json
+print(json.dumps({"secs": secs, "loaded": loaded}))
+"""
+
+# Line written to standard error by the probe once the module is
+# imported, after which import times are the probe's own.
+
+PROBE_DONE = "jobcalc.importtime: probe done"
+
+
+def parse_importtime(stderr):
+
+    """
+    Returns a list of (cumulative microseconds, module name) tuples
+    parsed from the output of "python -X importtime".
+
+    Lines which are not import time lines are ignored, as are those
+    after the probe has finished.
+    """
+
+    imports = []
+
+    for line in stderr.splitlines():
+        if line == PROBE_DONE:
+            break
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue
+        imports.append((cumulative, fields[2].strip()))
+
+    return imports
+
+
+def measure_import(module):
+
+    """
+    Imports a module in a fresh interpreter, and returns a dictionary
+    of the results.
+
+    The dictionary contains "module", "secs", the time taken, "loaded",
+    the names of the modules loaded, "cairo", True if Pycairo was loaded,
+    and "imports", a list of (cumulative microseconds, module name)
+    tuples for each import, which is empty before Python 3.7.
+
+    Arguments:
+    module -- the name of the module to import
+    """
+
+    args = [sys.executable]
+    if sys.version_info >= (3, 7):
+        args += ["-X", "importtime"]
+    args += ["-c", PROBE % (module, PROBE_DONE)]
+
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+
+    if proc.returncode:
+        raise RuntimeError("Importing %s failed:\n%s" % (module, stderr))
+
+    result = json.loads(stdout.strip().splitlines()[-1])
+    result["module"] = module
+    result["cairo"] = "cairo" in result["loaded"]
+    result["imports"] = parse_importtime(stderr)
+
+    return result
+
+
+def print_report(result, top):
+
+    """
+    Prints the report for one module.
+
+    Arguments:
+    result -- dictionary returned from measure_import()
+    top -- number of slowest imports to list
+    """
+
+    cairo = "loaded" if result["cairo"] else "not loaded"
+    print("%-16s %8.1fms  %4d modules  cairo %s" %
+          (result["module"], result["secs"] * 1000,
+           len(result["loaded"]), cairo))
+
+    for cumulative, name in sorted(result["imports"], reverse=True)[:top]:
+        print("    %8.1fms  %s" % (cumulative / 1000.0, name))
+
+
+def main():
+
+    """
+    Main function for JobCalc import time report.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Report the cold import time of JobCalc modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help="modules to import (default: %s)" %
+                             " ".join(DEFAULT_MODULES))
+    parser.add_argument("--top", type=int, default=5,
+                        help="slowest imports to list (default: 5)")
+    parser.add_argument("--json", action="store_true",
+                        help="write results as JSON")
+    args = parser.parse_args()
+
+    results = [measure_import(module) for module in args.modules]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print_report(result, args.top)
+
+
+# Call main() function if in __main__ namespace
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,603 @@
+"""
+Provides validation of job specifications for JobCalc.
+
+A job specification uses the same field names as the HTML form, e.g.
+"jobtype", "casingod" and "output". The fields allowed for each job
+type, and the rules they must meet, are declared in SCHEMAS and
+COMMON, and compiled once into a JobValidator, which runs a fixed
+list of checks over each job.
+
+Validation collects all the errors in a job, rather than stopping at
+the first, and returns a specification dictionary of converted field
+values which can be used to create a drawing page.
+
+This module does not depend on Pycairo, so jobs can be validated,
+e.g. a whole batch before any rendering starts, without loading the
+drawing code.
+
+To use:
+
+  -- spec = validate_job(job)
+  -- results = validate_many(jobs)
+  -- (component, page) = split_spec(spec)
+  -- name = output_name(job, spec, num, names)
+
+where 'job' is a dictionary of field values or a form object
+providing getvalue() and getlist(), such as cgi.FieldStorage.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import posixpath
+
+
+JOBTYPES = ["pipebend", "pipestraight"]
+CTYPES = ["onepiece", "segmented"]
+FLANGES = ["100PN16", "125PN16", "150PN16", "200PN16",
+           "250PN16", "300PN16", "400PN16"]
+OTYPES = ["pdf", "svg", "png"]
+OSIZES = ["A4", "Letter"]
+
+PIPE_NUMBERS = [("casingod", int), ("casingid", int),
+                ("liningod", int), ("liningid", int)]
+PIPE_RULES = [("positive",), ("decreasing", [n for n, c in PIPE_NUMBERS])]
+
+# Fields and rules for each job type. Numbers are required, and are
+# converted with the function given. Options are required, and must
+# be one of the allowed values. Flags are multi-valued fields, each
+# value setting a boolean in the specification. Rules are checked
+# in order, once the numbers have been converted:
+#
+#  -- ("positive",) -- all the numbers are greater than zero
+#  -- ("decreasing", fields) -- each field is greater than the next
+#  -- ("range", field, low, high, message) -- low < field <= high
+#  -- ("divides", field, other, message) -- field divides exactly,
+#     to two decimal places, into other
+
+SCHEMAS = {"pipebend": {
+               "numbers": PIPE_NUMBERS + [("nomrad", int),
+                                          ("bendangle", int),
+                                          ("segangle", float)],
+               "rules": PIPE_RULES + [
+                   ("range", "bendangle", 0, 90,
+                    "Bend angle must be greater than 0 " +
+                    "degrees and no more than 90 degrees!"),
+                   ("divides", "segangle", "bendangle",
+                    "Segment angle must divide into bend angle!")],
+               "options": [("casing", "casing", CTYPES)],
+               "flags": [("segdim", {"drg": "exdimdrg",
+                                     "box": "exdimbox"})]},
+           "pipestraight": {
+               "numbers": PIPE_NUMBERS + [("length", int)],
+               "rules": PIPE_RULES,
+               "options": [],
+               "flags": []}}
+
+# Fields common to all job types. Integers are optional, with a
+# default and an error message. Text fields are optional and default
+# to an empty string.
+
+COMMON = {"options": [("output", "output", OTYPES),
+                      ("flange", "flange", FLANGES),
+                      ("outputsize", "output size", OSIZES)],
+          "integers": [("qty", 1, "Quantity needs to be an integer!")],
+          "text": ["title", "projno", "customer", "material", "bonding",
+                   "finish", "servicetemp", "drgno", "checkedby"]}
+
+# Specification fields describing the drawing page rather than
+# the component.
+
+PAGE_FIELDS = (["output", "outputsize"] +
+               [f for f, d, m in COMMON["integers"]] + COMMON["text"])
+
+# Types of text field values kept as they are, including unicode
+# strings from JSON jobs under Python 2.
+
+STRING_TYPES = (type(""), type(u""))
+
+
+class FormError(Exception):
+
+    """
+    Exception raised when form input fails validation.
+
+    The exception message, the first error found, is suitable for
+    showing to the user. All the errors found are in 'errors'.
+    """
+
+    def __init__(self, message, errors=None):
+
+        """
+        Initializes a FormError instance.
+
+        Arguments:
+        message -- the error message
+        errors -- optional list of all error messages, defaults to
+        a list containing just 'message'
+        """
+
+        Exception.__init__(self, message)
+        self.errors = errors or [message]
+
+
+class DictForm:
+
+    """
+    Class to present a dictionary of field values as a form.
+
+    Empty values are treated as missing, as cgi.FieldStorage does
+    for blank form fields. String values for multi-valued fields
+    are split on commas.
+
+    Public methods:
+    __init__()
+    getvalue()
+    getlist()
+    """
+
+    def __init__(self, values):
+
+        """
+        Initializes a DictForm instance.
+
+        Arguments:
+        values -- dictionary of field names and values
+        """
+
+        self.values = values
+
+    def getvalue(self, field):
+
+        """
+        Returns the value of a field, or None if it is missing.
+        """
+
+        value = self.values.get(field)
+        return None if value == "" else value
+
+    def getlist(self, field):
+
+        """
+        Returns a list of the values of a multi-valued field.
+        """
+
+        value = self.getvalue(field)
+        if value is None:
+            return []
+        elif isinstance(value, (list, tuple)):
+            return list(value)
+        else:
+            return [v.strip() for v in str(value).split(",") if v.strip()]
+
+
+def option_check(field, name, allowed_values):
+
+    """
+    Returns a check that a required field has an allowed value.
+
+    Arguments:
+    field -- the name of the field
+    name -- the name of the field to use for error messages
+    allowed_values -- a list of allowed values for the field
+    """
+
+    allowed = frozenset(allowed_values)
+    missing = "Type of {0} not specified!".format(name)
+    invalid = "Invalid {0} type specified!".format(name)
+
+    def check(form, spec, errors):
+
+        """
+        Checks the field.
+        """
+
+        value = form.getvalue(field)
+        if value is None:
+            errors.append(missing)
+            return
+        try:
+            ok = value in allowed
+        except TypeError:
+            ok = False
+        if ok:
+            spec[field] = value
+        else:
+            errors.append(invalid)
+
+    return check
+
+
+def number_check(field, convert):
+
+    """
+    Returns a check that a required field is a number.
+
+    Arguments:
+    field -- the name of the field
+    convert -- function converting the value to a number
+    """
+
+    missing = "Missing input &mdash; %s!" % field
+    bad = "Bad value for %s!" % field
+
+    def check(form, spec, errors):
+
+        """
+        Checks the field.
+        """
+
+        value = form.getvalue(field)
+        if value is None:
+            errors.append(missing)
+            return
+        try:
+            spec[field] = convert(value)
+        except (ValueError, TypeError):
+            errors.append(bad)
+
+    return check
+
+
+def positive_check(field):
+
+    """
+    Returns a check that a number is greater than zero.
+    """
+
+    message = "%s must be greater than zero!" % field
+
+    def check(form, spec, errors):          # pylint: disable=W0613
+
+        """
+        Checks the field, if it was converted.
+        """
+
+        if field in spec and not spec[field] > 0:
+            errors.append(message)
+
+    return check
+
+
+def greater_check(field, other):
+
+    """
+    Returns a check that one number is greater than another.
+    """
+
+    message = "%s must be greater than %s!" % (field, other)
+
+    def check(form, spec, errors):          # pylint: disable=W0613
+
+        """
+        Checks the fields, if both were converted.
+        """
+
+        if field in spec and other in spec and not spec[field] > spec[other]:
+            errors.append(message)
+
+    return check
+
+
+def range_check(field, low, high, message):
+
+    """
+    Returns a check that a number is greater than 'low' and no
+    greater than 'high'.
+    """
+
+    def check(form, spec, errors):          # pylint: disable=W0613
+
+        """
+        Checks the field, if it was converted.
+        """
+
+        if field in spec and not low < spec[field] <= high:
+            errors.append(message)
+
+    return check
+
+
+def divides_check(field, other, message):
+
+    """
+    Returns a check that one number divides exactly into another,
+    to two decimal places.
+    """
+
+    def check(form, spec, errors):          # pylint: disable=W0613
+
+        """
+        Checks the fields, if both were converted.
+        """
+
+        if field in spec and other in spec:
+            divisor = round(spec[field] * 100)
+            if not divisor or round(spec[other] * 100) % divisor:
+                errors.append(message)
+
+    return check
+
+
+def flags_check(field, flags):
+
+    """
+    Returns a check setting booleans from a multi-valued field.
+
+    Arguments:
+    field -- the name of the field
+    flags -- dictionary mapping field values to specification keys
+    """
+
+    def check(form, spec, errors):          # pylint: disable=W0613
+
+        """
+        Sets the booleans. Unknown values are ignored.
+        """
+
+        values = form.getlist(field)
+        for value, key in flags.items():
+            spec[key] = value in values
+
+    return check
+
+
+def integer_check(field, default, message):
+
+    """
+    Returns a check that an optional field is an integer.
+    """
+
+    def check(form, spec, errors):
+
+        """
+        Checks the field.
+        """
+
+        value = form.getvalue(field)
+        if value is None or value == "":
+            spec[field] = default
+            return
+        try:
+            spec[field] = int(value)
+        except (ValueError, TypeError):
+            errors.append(message)
+
+    return check
+
+
+def text_check(field):
+
+    """
+    Returns a check reading an optional text field.
+
+    Values which are not strings, e.g. numbers from JSON jobs, are
+    converted to strings, but lists and dictionaries, e.g. from a
+    repeated form field, are errors.
+    """
+
+    bad = "Bad value for %s!" % field
+
+    def check(form, spec, errors):
+
+        """
+        Reads the field.
+        """
+
+        value = form.getvalue(field)
+        if value is None:
+            spec[field] = ""
+        elif isinstance(value, (list, tuple, dict)):
+            errors.append(bad)
+        elif isinstance(value, STRING_TYPES):
+            spec[field] = value
+        else:
+            spec[field] = str(value)
+
+    return check
+
+
+def compile_rules(numbers, rules):
+
+    """
+    Returns a list of checks for a list of rules.
+
+    Arguments:
+    numbers -- the (field, convert) tuples of the schema
+    rules -- the rule tuples of the schema
+    """
+
+    checks = []
+
+    for rule in rules:
+        if rule[0] == "positive":
+            checks.extend(positive_check(f) for f, c in numbers)
+        elif rule[0] == "decreasing":
+            fields = rule[1]
+            checks.extend(greater_check(a, b)
+                          for a, b in zip(fields, fields[1:]))
+        elif rule[0] == "range":
+            checks.append(range_check(*rule[1:]))
+        elif rule[0] == "divides":
+            checks.append(divides_check(*rule[1:]))
+        else:
+            raise ValueError("Unknown rule %r" % (rule[0],))
+
+    return checks
+
+
+class JobValidator:
+
+    """
+    Class to validate jobs against compiled schemas.
+
+    Public methods:
+    __init__()
+    validate()
+    validate_many()
+    """
+
+    def __init__(self, schemas=None, common=None):
+
+        """
+        Initializes a JobValidator instance, compiling the schemas.
+
+        Arguments:
+        schemas -- optional dictionary of schemas keyed by job type,
+        defaults to SCHEMAS
+        common -- optional schema of fields common to all job types,
+        defaults to COMMON
+        """
+
+        schemas = schemas or SCHEMAS
+        common = common or COMMON
+
+        self.jobtype_check = option_check("jobtype", "job", list(schemas))
+
+        # The checks run in the same order as the original form
+        # validation, so the first error is the one it would have
+        # reported.
+
+        self.checks = {}
+        for jobtype, schema in schemas.items():
+            checks = [number_check(f, c) for f, c in schema["numbers"]]
+            checks.extend(compile_rules(schema["numbers"], schema["rules"]))
+            checks.extend(option_check(*o) for o in schema["options"])
+            checks.extend(flags_check(*f) for f in schema["flags"])
+            self.checks[jobtype] = checks
+
+        self.common_checks = [option_check(*o) for o in common["options"]]
+        self.common_checks.extend(integer_check(*i)
+                                  for i in common["integers"])
+        self.common_checks.extend(text_check(t) for t in common["text"])
+
+    def validate(self, job):
+
+        """
+        Validates a job, and returns a (spec, errors) tuple.
+
+        'spec' is a dictionary of the converted field values, and
+        'errors' is a list of error messages, empty if the job is
+        valid. If the job is invalid, 'spec' may be incomplete.
+
+        Arguments:
+        job -- a dictionary of field values, or a form object
+        """
+
+        if isinstance(job, dict):
+            job = DictForm(job)
+
+        spec = {}
+        errors = []
+
+        self.jobtype_check(job, spec, errors)
+        for check in self.checks.get(spec.get("jobtype"), []):
+            check(job, spec, errors)
+        for check in self.common_checks:
+            check(job, spec, errors)
+
+        return (spec, errors)
+
+    def validate_many(self, jobs):
+
+        """
+        Validates a sequence of jobs, and returns a list of
+        (spec, errors) tuples, one for each job.
+        """
+
+        return [self.validate(job) for job in jobs]
+
+
+validator = JobValidator()
+
+
+def validate_job(job):
+
+    """
+    Validates a job and returns its specification dictionary.
+
+    Raises FormError if the job is invalid, with the first error as
+    its message and all the errors in its 'errors' attribute.
+
+    Arguments:
+    job -- a dictionary of field values, or a form object
+    """
+
+    spec, errors = validator.validate(job)
+    if errors:
+        raise FormError(errors[0], errors)
+    return spec
+
+
+def validate_many(jobs):
+
+    """
+    Validates a sequence of jobs in one pass, and returns a list of
+    (spec, errors) tuples, one for each job.
+    """
+
+    return validator.validate_many(jobs)
+
+
+def split_spec(spec):
+
+    """
+    Splits a job specification into component and page fields.
+
+    Returns a tuple of two dictionaries, the first holding the job
+    type and the fields describing the component, and the second
+    the fields describing the drawing page.
+    """
+
+    component = {}
+    page = {}
+    for key, value in spec.items():
+        if key in PAGE_FIELDS:
+            page[key] = value
+        else:
+            component[key] = value
+    return (component, page)
+
+
+def unused_name(names, stem, ext):
+
+    """
+    Returns a file name made from 'stem' and 'ext' which is not in
+    'names', adding a number to the stem if necessary.
+    """
+
+    name = "%s.%s" % (stem, ext)
+    num = 1
+    while name in names:
+        num += 1
+        name = "%s-%d.%s" % (stem, num, ext)
+    return name
+
+
+def output_name(job, spec, num, names):
+
+    """
+    Returns a file name for the drawing of a job, and adds it to
+    'names'.
+
+    Only the last part of a requested "outfile" is used, so that
+    drawings cannot be written outside of the output directory. Jobs
+    without a usable name, or whose name is already in 'names', are
+    named from the job number instead.
+
+    Arguments:
+    job -- the job dictionary
+    spec -- the validated job specification
+    num -- the number of the job, counting from one
+    names -- set of the names already used
+    """
+
+    name = posixpath.basename(str(job.get("outfile") or "").
+                              replace("\\", "/"))
+    if name in ["", ".", ".."] or name in names:
+        name = unused_name(names, "job%04d" % num, spec["output"])
+    names.add(name)
+    return name
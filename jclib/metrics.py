@@ -0,0 +1,284 @@
+"""
+Provides counters and histograms for monitoring JobCalc.
+
+Metrics are held in a registry and can be written out in the
+Prometheus text exposition format, so that they can be scraped by a
+Prometheus server or read by anything that understands it.
+
+To use:
+
+  -- registry = MetricsRegistry()
+  -- requests = registry.counter(name, help, labelnames=["route"])
+  -- requests.inc(["draw"])
+  -- latency = registry.histogram(name, help, buckets, ["otype"])
+  -- latency.observe(0.25, ["pdf"])
+  -- text = registry.render()
+
+All metrics may be updated from several threads at once.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import threading
+
+
+# Default histogram buckets, in seconds for latencies and
+# bytes for output sizes.
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0]
+SIZE_BUCKETS = [1024 * 4 ** n for n in range(9)]
+
+
+def format_value(value):
+
+    """
+    Returns a number formatted for the text exposition format.
+    """
+
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def format_labels(labelnames, labels, extra=None):
+
+    """
+    Returns the label part of a sample line, e.g. '{otype="pdf"}',
+    or an empty string if there are no labels.
+
+    Arguments:
+    labelnames -- sequence of label names
+    labels -- sequence of label values, in the same order
+    extra -- optional (name, value) tuple of a further label
+    """
+
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\")
+        value = value.replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append("%s=\"%s\"" % (name, value))
+
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+
+    """
+    Class for a counter, a value which only increases.
+
+    Public methods:
+    __init__()
+    inc()
+    get()
+    render()
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, helptext, labelnames=()):
+
+        """
+        Initializes a Counter instance.
+
+        Arguments:
+        name -- the metric name, e.g. "jobcalc_requests_total"
+        helptext -- a description of the metric
+        labelnames -- optional sequence of label names
+        """
+
+        self.name = name
+        self.helptext = helptext
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+
+        """
+        Increases the counter.
+
+        Arguments:
+        labels -- sequence of label values, one for each label name
+        amount -- the amount by which to increase the counter
+        """
+
+        labels = tuple(labels)
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+
+        """
+        Returns the value of the counter for some label values.
+        """
+
+        with self.lock:
+            return self.values.get(tuple(labels), 0)
+
+    def render(self):
+
+        """
+        Returns a list of sample lines in the text exposition format.
+        """
+
+        with self.lock:
+            values = sorted(self.values.items())
+
+        return ["%s%s %s" % (self.name, format_labels(self.labelnames, k),
+                             format_value(v)) for k, v in values]
+
+
+class Histogram:
+
+    """
+    Class for a histogram, which counts observed values in buckets.
+
+    Buckets are cumulative, as the text exposition format expects, so
+    each bucket counts the observations no greater than its upper
+    bound. The sum and count of all observations are also kept.
+
+    Public methods:
+    __init__()
+    observe()
+    render()
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, helptext, buckets=None, labelnames=()):
+
+        """
+        Initializes a Histogram instance.
+
+        Arguments:
+        name -- the metric name, e.g. "jobcalc_render_seconds"
+        helptext -- a description of the metric
+        buckets -- optional sequence of bucket upper bounds, defaults
+        to LATENCY_BUCKETS. A "+Inf" bucket is always added.
+        labelnames -- optional sequence of label names
+        """
+
+        self.name = name
+        self.helptext = helptext
+        self.labelnames = tuple(labelnames)
+        self.buckets = sorted(buckets or LATENCY_BUCKETS) + [float("inf")]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+
+        """
+        Records an observed value.
+
+        Arguments:
+        value -- the observed value
+        labels -- sequence of label values, one for each label name
+        """
+
+        labels = tuple(labels)
+        with self.lock:
+            counts, total = self.values.get(labels,
+                                            ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[labels] = (counts, total + value)
+
+    def render(self):
+
+        """
+        Returns a list of sample lines in the text exposition format.
+        """
+
+        with self.lock:
+            values = sorted((k, (list(c), s))
+                            for k, (c, s) in self.values.items())
+
+        lines = []
+
+        for labels, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                lines.append("%s_bucket%s %s" %
+                             (self.name,
+                              format_labels(self.labelnames, labels,
+                                            ("le", format_value(bound))),
+                              format_value(count)))
+            lines.append("%s_sum%s %s" %
+                         (self.name, format_labels(self.labelnames, labels),
+                          format_value(total)))
+            lines.append("%s_count%s %s" %
+                         (self.name, format_labels(self.labelnames, labels),
+                          format_value(counts[-1])))
+
+        return lines
+
+
+class MetricsRegistry:
+
+    """
+    Class to hold a set of metrics and render them together.
+
+    Public methods:
+    __init__()
+    counter()
+    histogram()
+    render()
+    """
+
+    def __init__(self):
+
+        """
+        Initializes a MetricsRegistry instance.
+        """
+
+        self.metrics = []
+
+    def counter(self, name, helptext, labelnames=()):
+
+        """
+        Creates, registers and returns a Counter.
+
+        Arguments are as for Counter.
+        """
+
+        metric = Counter(name, helptext, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, helptext, buckets=None, labelnames=()):
+
+        """
+        Creates, registers and returns a Histogram.
+
+        Arguments are as for Histogram.
+        """
+
+        metric = Histogram(name, helptext, buckets, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+
+        """
+        Returns all the metrics as a string in the Prometheus text
+        exposition format.
+        """
+
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.helptext))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
@@ -19,10 +19,86 @@ Provides a class to construct a technical drawing page.
 # pylint: disable=R0902
 
 
+import copy
 import cairo
-import tempfile
 import datetime
+import threading
+from io import BytesIO
 from jobcalc.helper import Point, LabeledValue, TextInfo, draw_text_box
+from jobcalc.helper import get_largest_text_height, get_text_extents
+from jobcalc.timing import stage
+
+
+# Default size, in pixels, of component previews, and the margin
+# left around the outline.
+
+PREVIEW_SIZE = 240
+PREVIEW_MARGIN = 6
+
+
+# Pre-rendered title blocks, keyed by page size, client and the
+# heights of the title block rows, which can vary with the text
+# in them. The cache is simply emptied when it becomes full.
+
+title_blocks = {}
+TITLE_BLOCK_CACHE_SIZE = 64
+
+# Contexts for measuring the text which makes up the title block
+# cache key, one per thread, since contexts cannot be shared
+# between threads.
+
+measuring = threading.local()
+
+
+def get_measuring_context():
+
+    """
+    Returns this thread's context for measuring text.
+
+    The context is on a recording surface, as the title block is, so
+    text extents cached from it are the same as those measured when
+    the title block is drawn.
+    """
+
+    ctx = getattr(measuring, "ctx", None)
+    if ctx is None:
+        ctx = cairo.Context(cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                                   None))
+        measuring.ctx = ctx
+    return ctx
+
+
+class TitleBlock:
+
+    """
+    Class to hold a pre-rendered title block.
+
+    The title block contains the page border and all the parts of the
+    drawing information which are the same for a given page size and
+    client, and is recorded on a Pycairo recording surface so that it
+    can be replayed onto any page.
+
+    Public methods:
+    __init__()
+    """
+
+    def __init__(self, surface, page):
+
+        """
+        Initializes a TitleBlock instance.
+
+        Arguments:
+        surface -- the recording surface holding the title block
+        page -- the DrawingPage instance which drew the title block,
+        from which the layout of the variable information is copied
+        """
+
+        self.surface = surface
+        self.notice_h = page.notice_h
+        self.infoboxheight = page.page_infoboxheight
+        self.field_p = page.field_p
+        self.title_p = page.title_p
+        self.title_w = page.title_w
 
 
 class DrawingPage:
@@ -31,6 +107,10 @@ class DrawingPage:
     Drawing page class, provides a page to frame the drawn component.
     """
 
+    info_keys = [["cust", "projno", "drgno", "qty"],
+                 ["mat", "bond", "finish", "svctemp"],
+                 ["date", "scale", "drwnby", "chkby"]]
+
     def __init__(self, component, otype="svg", osize="Letter", title="",
                  projno="", drgno="", qty="", customer="", material="",
                  bonding="", finish="", servicetemp="", checkedby=""):
@@ -54,11 +134,16 @@ class DrawingPage:
         self.page_inner_margin_x = 0
         self.page_inner_margin_y = 0
         self.page_infoboxheight = 100
+        self.notice_h = 0
         self.page_infoboxspacing = 5
         self.page_line_width = 0.5
         self.line_color = (0, 0, 0)
         self.scale_p = Point(0, 0)
+        self.field_p = {}
+        self.title_p = Point(0, 0)
+        self.title_w = 0
         self.output_type = otype
+        self.output_size = osize
         self.component = component
 
         self.text = {"info": TextInfo(face="Arial", size=8,
@@ -100,49 +185,268 @@ class DrawingPage:
                          "drwnby": LabeledValue("Drawn by", "JobCalc v1.0"),
                          "chkby": LabeledValue("Checked by", checkedby)}
 
-    def draw(self, outfile):
+    def draw(self, outfile, timer=None):
 
         """
         Master function for creating the drawing.
 
-        This is the only public drawing function.
+        This, draw_bytes(), draw_formats() and draw_page() are the
+        only public drawing functions.
+
+        Arguments:
+        outfile -- a filename, or a writable file object, for the output
+        timer -- optional jobcalc.timing.StageTimer instance, in which
+        the time taken by each stage of the drawing is recorded
+        """
+
+        if timer is None:
+            self.draw_surface(outfile)
+        else:
+            timer.activate()
+            try:
+                with timer.stage("draw"):
+                    self.draw_surface(outfile)
+            finally:
+                timer.deactivate()
+
+    def draw_surface(self, outfile):
+
+        """
+        Creates the output surface, draws the page and writes it.
+
+        Arguments:
+        outfile -- a filename, or a writable file object, for the output
+        """
+
+        surface = self.new_surface(self.output_type, outfile)
+        self.draw_page(cairo.Context(surface))
+
+        with stage("finish"):
+            self.finish_surface(surface, self.output_type, outfile)
+
+    def new_surface(self, otype, outfile):
+
         """
+        Creates and returns an output surface the size of the page.
 
-        if self.output_type == "pdf":
+        Image surfaces are painted white, since they are otherwise
+        transparent.
+
+        Arguments:
+        otype -- the output type, "pdf", "svg" or "png"
+        outfile -- a filename, or a writable file object, for the output
+        """
+
+        if otype == "pdf":
             surface = cairo.PDFSurface(outfile,
                                        self.page_width, self.page_height)
-        elif self.output_type == "svg":
+        elif otype == "svg":
             surface = cairo.SVGSurface(outfile,
                                        self.page_width, self.page_height)
-        elif self.output_type == "png":
+        elif otype == "png":
             surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
                                        self.page_width, self.page_height)
 
-        self.ctx = cairo.Context(surface)
+            ctx = cairo.Context(surface)
+            ctx.set_source_rgb(1.0, 1.0, 1.0)
+            ctx.paint()
+
+        return surface
+
+    def finish_surface(self, surface, otype, outfile):
+
+        """
+        Writes all output from a surface created by new_surface().
+
+        Arguments:
+        surface -- the output surface
+        otype -- the output type, "pdf", "svg" or "png"
+        outfile -- a filename, or a writable file object, for the output
+        """
+
+        if otype == "pdf" or otype == "svg":
+
+            # Finish the surface explicitly so that all output is
+            # written to 'outfile' before we return, rather than when
+            # the surface is garbage collected, since long-running
+            # callers may read 'outfile' straight away.
+
+            surface.show_page()
+            surface.finish()
+        elif otype == "png":
+            surface.write_to_png(outfile)
 
-        if self.output_type == "png":
+    def draw_bytes(self, timer=None):
+
+        """
+        Creates the drawing and returns the output as bytes.
+
+        Arguments:
+        timer -- optional jobcalc.timing.StageTimer instance, as for draw()
+        """
+
+        outfile = BytesIO()
+        self.draw(outfile, timer)
+        return outfile.getvalue()
+
+    def draw_formats(self, otypes, timer=None):
+
+        """
+        Creates the drawing in several output types at once.
+
+        The page is drawn once onto a recording surface, which is then
+        replayed onto a surface for each output type, so the layout,
+        text measurement and scaling of the drawing are only done once.
+        The page's own output type is ignored.
+
+        Returns a dictionary of the output bytes keyed by output type.
+
+        Arguments:
+        otypes -- a sequence of output types, "pdf", "svg" or "png"
+        timer -- optional jobcalc.timing.StageTimer instance, as for draw()
+        """
+
+        if timer is None:
+            return self.replay_formats(otypes)
+
+        timer.activate()
+        try:
+            with timer.stage("draw_formats"):
+                return self.replay_formats(otypes)
+        finally:
+            timer.deactivate()
+
+    def replay_formats(self, otypes):
+
+        """
+        Records the page and replays it for each output type,
+        returning a dictionary of output bytes as draw_formats().
+        """
+
+        recording = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                (0, 0, self.page_width, self.page_height))
+        self.draw_page(cairo.Context(recording))
+
+        outputs = {}
+
+        for otype in otypes:
+            with stage("replay_" + otype):
+                outfile = BytesIO()
+                surface = self.new_surface(otype, outfile)
+                ctx = cairo.Context(surface)
+                ctx.set_source_surface(recording, 0, 0)
+                ctx.paint()
+                self.finish_surface(surface, otype, outfile)
+                outputs[otype] = outfile.getvalue()
+
+        return outputs
+
+    def draw_page(self, ctx):
+
+        """
+        Draws the page onto an existing Pycairo context.
+
+        The caller is responsible for creating the surface and for
+        showing the page afterwards. The surface should be the same
+        size as the page.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        # Draw a shallow copy of the page, with its own drawing scale,
+        # so that the layout and scale set while drawing are not kept
+        # and the page can be drawn again, or from several threads at
+        # once.
+
+        page = copy.copy(self)
+        page.drg_info = dict(self.drg_info)
+        page.drg_info["scale"] = copy.copy(self.drg_info["scale"])
+        page.draw_page_copy(ctx)
+
+    def draw_page_copy(self, ctx):
+
+        """
+        Draws the page for draw_page(), which calls this on a copy.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        with stage("title_block"):
+            block = self.get_title_block()
+
+        self.ctx = ctx
+        self.notice_h = block.notice_h
+        self.page_infoboxheight = block.infoboxheight
+        self.field_p = block.field_p
+        self.scale_p = block.field_p["scale"]
+        self.title_p = block.title_p
+        self.title_w = block.title_w
+
+        with stage("paint_title_block"):
             self.ctx.save()
-            self.ctx.set_source_rgb(1.0, 1.0, 1.0)
+            self.ctx.set_source_surface(block.surface, 0, 0)
             self.ctx.paint()
             self.ctx.restore()
 
-        self.draw_base_page()
-        self.draw_drawing_info()
-        self.draw_component()
+        with stage("draw_drawing_fields"):
+            self.draw_drawing_fields()
 
-        if self.output_type == "pdf" or self.output_type == "svg":
-            surface.show_page()
-        elif self.output_type == "png":
-            imgfile = tempfile.TemporaryFile()
-            surface.write_to_png(imgfile)
-            imgfile.seek(0)
-            outfile.write(imgfile.read())
-            imgfile.close()
+        with stage("component"):
+            self.draw_component()
+
+    def get_title_block(self):
+
+        """
+        Returns the pre-rendered title block for the page.
+
+        The title block is drawn and cached if one with the same
+        layout has not already been drawn.
+        """
+
+        ctx = get_measuring_context()
+
+        # The row heights of the text boxes depend on the text in the
+        # rows, so they need to be part of the key, but in practice
+        # they rarely vary since the labels contain both capitals and
+        # descenders.
+
+        heights = []
+        for k in self.info_keys:
+            heights.append(get_largest_text_height(ctx,
+                                [self.drg_info[j].label for j in k] +
+                                [self.drg_info[j].value for j in k],
+                                self.text["info"]))
+        heights.append(get_largest_text_height(ctx,
+                            [self.drg_info["title"].value],
+                            self.text["title"]))
+
+        key = (self.page_width, self.page_height,
+               self.client) + tuple(heights)
+        block = title_blocks.get(key)
+
+        if block is None:
+            surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+            self.ctx = cairo.Context(surface)
+            with stage("draw_base_page"):
+                self.draw_base_page()
+            with stage("draw_drawing_info"):
+                self.draw_drawing_info()
+            block = TitleBlock(surface, self)
+
+            if len(title_blocks) >= TITLE_BLOCK_CACHE_SIZE:
+                title_blocks.clear()
+            title_blocks[key] = block
+
+        return block
 
     def draw_base_page(self):
 
         """
         Draws the base page.
+
+        This is drawn as part of the pre-rendered title block.
         """
 
         pw = self.page_width - self.page_margin * 2
@@ -173,7 +477,7 @@ class DrawingPage:
         self.ctx.line_to(pw, bh)
         self.ctx.stroke()
 
-        self.page_inner_margin_y += bh
+        self.notice_h = bh
 
         self.ctx.restore()
 
@@ -181,6 +485,10 @@ class DrawingPage:
 
         """
         Draws the information boxes.
+
+        This is drawn as part of the pre-rendered title block, so only
+        the labels are drawn, and the positions of the values are
+        recorded for draw_drawing_fields().
         """
 
         pw = self.page_width - self.page_margin * 2
@@ -194,12 +502,11 @@ class DrawingPage:
 
         # Calculate info box widths
 
-        self.ctx.select_font_face(*self.text["client"].face)
-        self.ctx.set_font_size(self.text["client"].size)
+        ti = self.text["client"]
 
         # pylint: disable=W0612
 
-        (bx, by, w, h, dx, dy) = self.ctx.text_extents(self.client)
+        (bx, by, w, h, dx, dy) = get_text_extents(self.ctx, ti, self.client)
 
         # pylint: enable=W0612
 
@@ -210,11 +517,9 @@ class DrawingPage:
 
         x = ibs
         y = ph - ibs
-        keys = [["cust", "projno", "drgno", "qty"],
-                ["mat", "bond", "finish", "svctemp"],
-                ["date", "scale", "drwnby", "chkby"]]
+        self.field_p = {}
 
-        for k in keys:
+        for k in self.info_keys:
             labels, fields = zip(*[(self.drg_info[j].label,
                                     self.drg_info[j].value) for j in k])
 
@@ -222,12 +527,12 @@ class DrawingPage:
 
             (bw, bh, fps) = draw_text_box(ctx=self.ctx, bottomleft=Point(x, y),
                                   labels=labels, fields=fields,
-                                  textinfo=self.text["info"], width=ibw)
+                                  textinfo=self.text["info"], width=ibw,
+                                  nofields=True)
 
             # pylint: enable=W0612
 
-            if k[1] == "scale":
-                self.scale_p = fps[1]
+            self.field_p.update(zip(k, fps))
 
             x += (ibw + ibs)
 
@@ -247,19 +552,23 @@ class DrawingPage:
         (bw, bh, fps) = draw_text_box(ctx=self.ctx, bottomleft=Point(x, y),
                                width=width,
                                labels=[self.drg_info["title"].value],
-                               textinfo=self.text["title"], center=True)
+                               textinfo=self.text["title"], center=True,
+                               nolabels=True)
+
+        self.title_p = Point(*self.ctx.user_to_device(
+                                    x, y - self.text["title"].padding))
+        self.title_w = width
 
         # Set info box height
 
         self.page_infoboxheight = ph - (y - ibs - bh)
         ibh = self.page_infoboxheight
 
-        # Draw Omegaslate box
+        # Draw Omegaslate box, 'w' and 'h' still being the extents
+        # of the client name measured above
 
-        self.ctx.select_font_face(*self.text["client"].face)
-        self.ctx.set_font_size(self.text["client"].size)
-
-        (bx, by, w, h, dx, dy) = self.ctx.text_extents(self.client)
+        self.ctx.set_font_face(ti.font_face)
+        self.ctx.set_font_size(ti.size)
 
         x = pw - ibs - w - self.text["client"].padding
         y = ph - ibh + ibs + self.text["client"].padding + h
@@ -277,7 +586,7 @@ class DrawingPage:
                  "Company Tag Line",
                  "Telephone and Fax"]
 
-        self.ctx.select_font_face(*self.text["info"].face)
+        self.ctx.set_font_face(self.text["info"].font_face)
         self.ctx.set_font_size(self.text["info"].size)
         self.ctx.set_source_rgb(*self.text["info"].color)
 
@@ -288,7 +597,8 @@ class DrawingPage:
                 mult = 1
 
             y += (h + self.text["client"].padding) * mult
-            (bx, by, w, h, dx, dy) = self.ctx.text_extents(lstr)
+            (bx, by, w, h, dx, dy) = get_text_extents(self.ctx,
+                                                      self.text["info"], lstr)
             x = pw - ibs - (cbw / 2) - (w / 2)
             self.ctx.move_to(x, y)
             self.ctx.show_text(lstr)
@@ -302,6 +612,46 @@ class DrawingPage:
 
         self.ctx.restore()
 
+    def draw_drawing_fields(self):
+
+        """
+        Draws the drawing information which varies between drawings.
+
+        The drawing scale is drawn later by draw_component().
+        """
+
+        self.ctx.save()
+
+        ti = self.text["info"]
+        self.ctx.set_font_face(ti.font_face)
+        self.ctx.set_font_size(ti.size)
+        self.ctx.set_source_rgb(*ti.color)
+
+        for key, p in self.field_p.items():
+            if key != "scale":
+                self.ctx.move_to(*p.t())
+                self.ctx.show_text(self.drg_info[key].value)
+
+        # Center the title in the title box
+
+        ti = self.text["title"]
+        title = self.drg_info["title"].value
+        self.ctx.set_font_face(ti.font_face)
+        self.ctx.set_font_size(ti.size)
+        self.ctx.set_source_rgb(*ti.color)
+
+        # pylint: disable=W0612
+
+        (bx, by, w, h, dx, dy) = get_text_extents(self.ctx, ti, title)
+
+        # pylint: enable=W0612
+
+        self.ctx.move_to(self.title_p.x + (self.title_w - w) / 2,
+                         self.title_p.y)
+        self.ctx.show_text(title)
+
+        self.ctx.restore()
+
     def draw_component(self):
 
         """
@@ -310,7 +660,7 @@ class DrawingPage:
 
         m = self.page_margin + self.page_inner_margin
         x = m + self.page_inner_margin_x
-        y = m + self.page_inner_margin_y
+        y = m + self.page_inner_margin_y + self.notice_h
         w = self.page_width - m * 2
         h = self.page_height - self.page_infoboxheight - y * 2
 
@@ -333,8 +683,97 @@ class DrawingPage:
         self.ctx.save()
         self.ctx.set_line_width(self.page_line_width)
         self.ctx.set_source_rgb(*self.line_color)
-        self.ctx.select_font_face(*self.text["info"].face)
+        self.ctx.set_font_face(self.text["info"].font_face)
         self.ctx.set_font_size(self.text["info"].size)
         self.ctx.move_to(*self.scale_p.t())
         self.ctx.show_text(self.drg_info["scale"].value)
         self.ctx.restore()
+
+
+def draw_pdf_pack(pages, outfile, errors=None):
+
+    """
+    Draws a sequence of drawing pages as a single multi-page PDF.
+
+    All pages share one PDF surface, so fonts and other resources are
+    embedded once for the whole pack. The output type of each page is
+    ignored. The PDF surface is only created when the first page is
+    drawn, so if 'outfile' is a filename and no pages are drawn, no
+    file is created.
+
+    Returns the number of pages drawn.
+
+    Arguments:
+    pages -- an iterable of DrawingPage instances
+    outfile -- a filename, or a writable file object, for the output
+    errors -- optional function called with each page which fails to
+    draw and the exception raised. The page is left out of the pack,
+    and the other pages are still drawn. Without this function, the
+    exception is raised.
+    """
+
+    surface = None
+    drawn = 0
+
+    for page in pages:
+
+        # When errors are handled, each page is drawn first on a
+        # recording surface, so that a page which fails part way
+        # leaves nothing on the pack, and is then replayed onto it.
+
+        if errors is not None:
+            recording = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                               (0, 0, page.page_width,
+                                                page.page_height))
+            try:
+                page.draw_page(cairo.Context(recording))
+            except Exception as err:        # pylint: disable=W0703
+                errors(page, err)
+                continue
+
+        if surface is None:
+            surface = cairo.PDFSurface(outfile,
+                                       page.page_width, page.page_height)
+        else:
+            surface.set_size(page.page_width, page.page_height)
+
+        ctx = cairo.Context(surface)
+        if errors is not None:
+            ctx.set_source_surface(recording)
+            ctx.paint()
+        else:
+            page.draw_page(ctx)
+        surface.show_page()
+        drawn += 1
+
+    if surface is not None:
+        surface.finish()
+
+    return drawn
+
+
+def draw_preview(component, outfile, width=PREVIEW_SIZE, height=PREVIEW_SIZE):
+
+    """
+    Draws a small PNG preview of a component's outline.
+
+    Only the outline of the component is drawn, with no title block,
+    text or dimensions, so the preview is quick enough to redraw as
+    form input changes.
+
+    Arguments:
+    component -- a DrawnComponent instance
+    outfile -- a filename, or a writable file object, for the output
+    width, height -- size of the preview, in pixels
+    """
+
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    ctx = cairo.Context(surface)
+    ctx.set_source_rgb(1.0, 1.0, 1.0)
+    ctx.paint()
+
+    ctx.translate(PREVIEW_MARGIN, PREVIEW_MARGIN)
+    component.draw_preview(ctx, width - PREVIEW_MARGIN * 2,
+                           height - PREVIEW_MARGIN * 2)
+
+    surface.write_to_png(outfile)
@@ -12,6 +12,7 @@ from math import pi
 from jobcalc.helper import ptoc, draw_dim_line
 from jobcalc.flange import Flange
 from jobcalc.component import DrawnComponent
+from jobcalc.timing import stage
 
 
 class Pipe(DrawnComponent):
@@ -45,6 +46,9 @@ class Pipe(DrawnComponent):
 
         # Properties common to all pipe components
 
+        self.params.update({"casingod": casingod, "casingid": casingid,
+                            "liningod": liningod, "liningid": liningid,
+                            "flange": flange})
         self.flange = Flange(flange)
 
         # Bend diameters and radii common to all pipe components
@@ -119,17 +123,63 @@ class Pipe(DrawnComponent):
         # segments with just side outlines, avoids drawing overlapping
         # lines across the bend face.
 
-        self.draw_pipe_comp(ctx, "co", fill=True)
-        self.draw_pipe_comp(ctx, "ci", fill=True, edges=True)
-        self.draw_pipe_comp(ctx, "lo", fill=True, edges=True)
-        self.draw_pipe_comp(ctx, "li", fill=True, edges=True)
-        self.draw_pipe_comp(ctx, "co", outline=True)
+        with stage("draw_pipe_comps"):
+            self.draw_pipe_comp(ctx, "co", fill=True)
+            self.draw_pipe_comp(ctx, "ci", fill=True, edges=True)
+            self.draw_pipe_comp(ctx, "lo", fill=True, edges=True)
+            self.draw_pipe_comp(ctx, "li", fill=True, edges=True)
+            self.draw_pipe_comp(ctx, "co", outline=True)
 
         # Draw the other components
 
-        self.draw_bend_profile(ctx)
-        self.draw_rad_dims(ctx)
-        self.draw_flanges(ctx)
+        with stage("draw_bend_profile"):
+            self.draw_bend_profile(ctx)
+        with stage("draw_rad_dims"):
+            self.draw_rad_dims(ctx)
+        with stage("draw_flanges"):
+            self.draw_flanges(ctx)
+
+    def outline_path(self, ctx):
+
+        """
+        Adds the outline of the casing and flanges to the current path.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        # pylint: disable=E1101
+
+        pts = self.pc_pts["out"]["co"] + self.pc_pts["in"]["co"]
+        ctx.move_to(*pts[0].t())
+        for point in pts[1:]:
+            ctx.line_to(*point.t())
+        ctx.close_path()
+
+        # pylint: enable=E1101
+
+        section = self.flange.get_paths()["section"]
+        for cfp, angle in self.get_flange_ends():
+            ctx.save()
+            ctx.translate(*cfp.t())
+            ctx.rotate(-angle)
+            ctx.append_path(section)
+            ctx.restore()
+
+    def draw_outline(self, ctx):
+
+        """
+        Draws the outlines of the casing, the bore and the flange
+        cross-sections, for a preview.
+
+        Arguments:
+        ctx -- a Pycairo context
+        """
+
+        self.draw_pipe_comp(ctx, "co", fill=True, outline=True)
+        self.draw_pipe_comp(ctx, "li", fill=True, outline=True)
+        for cfp, angle in self.get_flange_ends():
+            self.flange.draw(ctx, cfp=cfp, angle=angle)
 
     def draw_pipe_comp(self, ctx, comp, fill=False,
                        outline=False, edges=False):
@@ -210,7 +260,7 @@ class Pipe(DrawnComponent):
 
         ctx.set_dash(self.dash_style)
         for point in self.pc_pts["ctr"]:          # pylint: disable=E1101
-            if point == self.pc_pts["ctr"][0]:    # pylint: disable=E1101
+            if point is self.pc_pts["ctr"][0]:    # pylint: disable=E1101
                 ctx.move_to(*point.t())
             else:
                 ctx.line_to(*point.t())
@@ -290,6 +340,20 @@ class Pipe(DrawnComponent):
         ctx -- a Pycairo context
         """
 
+        (lower, upper) = self.get_flange_ends()
+
+        self.flange.draw(ctx, cfp=lower[0], angle=lower[1],
+                         profile=True, dash_style=self.dash_style)
+        self.flange.draw(ctx, cfp=upper[0], angle=upper[1],
+                         profile=False)
+
+    def get_flange_ends(self):
+
+        """
+        Returns a list of (center end face point, angle) tuples for
+        the lower and upper flanges.
+        """
+
         # The angle at which the upper flange is drawn
         # depends on the bend angle for pipe bends, but is always
         # horizontal for pipe straights. Since this will be called
@@ -303,9 +367,9 @@ class Pipe(DrawnComponent):
         else:
             b_arc = 0
 
-        self.flange.draw(ctx, cfp=self.pc_pts["ctr"][0], angle=0,
-                         profile=True, dash_style=self.dash_style)
-        self.flange.draw(ctx, cfp=self.pc_pts["ctr"][-1], angle=b_arc + pi,
-                         profile=False)
+        ends = [(self.pc_pts["ctr"][0], 0),
+                (self.pc_pts["ctr"][-1], b_arc + pi)]
 
         # pylint: enable=E1101
+
+        return ends
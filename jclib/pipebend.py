@@ -17,11 +17,13 @@ Provides a class for pipe bend jobs.
 # pylint: disable=R0902
 
 
-from math import pi, radians, sin, cos, tan
+from math import pi, sin, cos
+from jobcalc.geometry import BendGeometry
 from jobcalc.helper import ptoc, Point, LabeledValue, draw_text_box
 from jobcalc.helper import draw_dim_label, draw_dim_line, draw_arrowhead
 from jobcalc.helper import get_largest_text_width
 from jobcalc.pipe import Pipe
+from jobcalc.timing import stage
 
 
 class PipeBend(Pipe):
@@ -64,11 +66,16 @@ class PipeBend(Pipe):
 
         # Bend angles, properties and information
 
+        self.params.update({"nomrad": nomrad, "bendangle": bendangle,
+                            "segangle": segangle, "ctype": ctype,
+                            "exdimdrg": exdimdrg, "exdimbox": exdimbox})
+        self.geometry = BendGeometry(nomrad, casingod, casingid, liningod,
+                                     liningid, bendangle, segangle)
         self.bend_arc_d = bendangle
         self.segment_angle_d = segangle
-        self.bend_arc = radians(bendangle)
-        self.segment_angle = radians(segangle)
-        self.num_segments = int(self.bend_arc / self.segment_angle)
+        self.bend_arc = self.geometry.bend_arc
+        self.segment_angle = self.geometry.segment_angle
+        self.num_segments = self.geometry.num_segments
         self.casing_type = ctype
         self.ex_dim_box = exdimbox
         self.ex_dim_drg = exdimdrg
@@ -79,41 +86,29 @@ class PipeBend(Pipe):
 
         self.diameters["nom"] = nomrad * 2
 
-        outer_radii = {"nom": nomrad,
-                       "co": nomrad + casingod / 2.0,
-                       "ci": nomrad + casingid / 2.0,
-                       "lo": nomrad + liningod / 2.0,
-                       "li": nomrad + liningid / 2.0,
-                       "fo": nomrad + fod / 2.0}
-        inner_radii = {"nom": nomrad,
-                       "co": nomrad - casingod / 2.0,
-                       "ci": nomrad - casingid / 2.0,
-                       "lo": nomrad - liningod / 2.0,
-                       "li": nomrad - liningid / 2.0,
-                       "fo": nomrad - fod / 2.0}
+        outer_radii = dict(self.geometry.radii["outer"])
+        outer_radii["fo"] = nomrad + fod / 2.0
+        inner_radii = dict(self.geometry.radii["inner"])
+        inner_radii["fo"] = nomrad - fod / 2.0
         self.radii = {"inner": inner_radii,
                       "outer": outer_radii,
                       "nom": nomrad}
 
-        # Calculate and store segment dimensions
-
-        # pylint: disable=C0103
+        # Store labeled segment dimensions
 
         self.segdims = {}
-        for k, i, d, l in zip(["cex", "cin", "lex", "lin", "mean"],
-                              ["outer", "inner", "outer", "inner", "outer"],
-                              ["co", "co", "lo", "lo", "nom"],
-                              ["Casing seg. extra. length",
-                               "Casing seg. intra. length",
-                               "Lining seg. extra. length",
-                               "Lining seg. intra. length",
-                               "Mean seg. length"]):
-            dim = self.radii[i][d] * tan(self.segment_angle / 2) * 2
-            self.segdims[k] = LabeledValue(l, dim)
-
-        # pylint: enable=C0103
-
-        # Calculate segmented component points
+        for k, l in zip(BendGeometry.segdim_keys,
+                        ["Casing seg. extra. length",
+                         "Casing seg. intra. length",
+                         "Lining seg. extra. length",
+                         "Lining seg. intra. length",
+                         "Mean seg. length"]):
+            self.segdims[k] = LabeledValue(l, self.geometry.segdims[k])
+
+        # Calculate segmented component points. The segment vertex
+        # angles are the same for every radius, so their sines and
+        # cosines are calculated once, and each set of points is then
+        # just scaled by its radius.
 
         pc_pts_out = {}
         pc_pts_in = {}
@@ -130,36 +125,12 @@ class PipeBend(Pipe):
 
         """
         Calculates coordinates for segment vertices at a specified radius.
-        """
 
-        # Note that the nominal radius of the bend is calculated to the
-        # center of the segment at its mid-point, not at its end. If this
-        # were not so, the midpoint of the bend ends would not align with the
-        # nominal radius, as the bend is always ended with half segments.
-        # Since we are calculating coordinates for the segment vertices
-        # at the ends, and not for the mid-points, we cannot use the
-        # nominal radius to do this. Instead, we use the 'erad' variable
-        # which calculates the radius we need to use for the segment
-        # vertices that will cause the segment mid-points to align
-        # with the nominal radius.
-
-        # Contrast this with calculating the segment intrados and
-        # extrados lengths, in the class initializer, where we do
-        # use the nominal radius, but calculate a tangent. This
-        # is not available here due to the ptoc() function needing
-        # a radius to the end points, rather than to the mid point.
-
-        pts = []
-        s_ang = self.segment_angle
-        b_arc = self.bend_arc
-        erad = rad / cos(s_ang / 2)
-
-        pts.append(ptoc(0, rad))
-        for ang in [n + 0.5 for n in range(self.num_segments)]:
-            pts.append(ptoc(s_ang * ang, erad))
-        pts.append(ptoc(b_arc, rad))
+        Arguments:
+        rad -- the radius, to the segment mid-points
+        """
 
-        return pts
+        return self.geometry.get_segment_points(rad)
 
     def draw_pre_scale(self, ctx, page_w, page_h):
 
@@ -191,11 +162,15 @@ class PipeBend(Pipe):
 
         # ...and then provide bend-specific drawing functionality.
 
-        self.draw_ribs(ctx, "li")
-        self.draw_center_arc(ctx)
-        self.draw_arc_dims(ctx)
+        with stage("draw_ribs"):
+            self.draw_ribs(ctx, "li")
+        with stage("draw_center_arc"):
+            self.draw_center_arc(ctx)
+        with stage("draw_arc_dims"):
+            self.draw_arc_dims(ctx)
         if self.ex_dim_drg:
-            self.draw_seg_dims(ctx)
+            with stage("draw_seg_dims"):
+                self.draw_seg_dims(ctx)
 
     def draw_pipe_comp(self, ctx, comp, fill=False,
                        outline=False, edges=False):
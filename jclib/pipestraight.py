@@ -11,6 +11,7 @@ Provides a class for pipe straight jobs.
 from jobcalc.helper import Point, get_largest_text_height
 from jobcalc.helper import get_largest_text_width, draw_dim_line
 from jobcalc.pipe import Pipe
+from jobcalc.timing import stage
 
 
 class PipeStraight(Pipe):
@@ -41,6 +42,7 @@ class PipeStraight(Pipe):
 
         # Straight properties
 
+        self.params["length"] = length
         self.length = length
         self.len_dim_line_length = 0
         self.len_dim_line_length_offset_m = 1
@@ -84,8 +86,10 @@ class PipeStraight(Pipe):
 
         # ...and then provide straight-specific drawing functionality.
 
-        self.draw_center_line(ctx)
-        self.draw_len_dim(ctx)
+        with stage("draw_center_line"):
+            self.draw_center_line(ctx)
+        with stage("draw_len_dim"):
+            self.draw_len_dim(ctx)
 
     def set_scale(self, ctx, page_w, page_h):
 
@@ -0,0 +1,342 @@
+"""
+Provides an asynchronous render queue for drawing jobs.
+
+Jobs are submitted as dictionaries of form field values, validated
+straight away, and stored in a local SQLite database. A pool of
+worker threads renders queued jobs in the background and stores the
+output in the database, from which it can be fetched by job ID until
+it expires.
+
+Several processes may share one database, each with its own workers,
+since a job is claimed by a single worker in an exclusive transaction.
+
+If a worker dies while rendering, e.g. because its process is killed,
+its job is queued again once it has been running for longer than the
+run timeout, and fails after a number of such attempts. Jobs which
+are never finished expire in the same way as finished jobs.
+
+To use:
+
+  -- queue = RenderQueue(path, workers=2, expiry=3600)
+  -- queue.start()
+  -- jobid = queue.submit(job)
+  -- (status, output, data) = queue.result(jobid)
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from jobcalc.form import page_from_form, DictForm
+from jobcalc.jobspec import validate_job
+from jobcalc.timing import StageTimer
+
+
+log = logging.getLogger(__name__)
+
+
+class RenderQueue:
+
+    """
+    Class to queue drawing jobs for rendering in the background.
+
+    Jobs have a status of "queued", "running", "done" or "failed".
+
+    Public methods:
+    __init__()
+    start()
+    submit()
+    status()
+    result()
+    purge()
+    """
+
+    def __init__(self, path, workers=2, expiry=3600, poll_interval=0.5,
+                 run_timeout=300, max_attempts=3):
+
+        """
+        Initializes a RenderQueue instance, creating the database
+        if necessary.
+
+        Arguments:
+        path -- path of the SQLite database file
+        workers -- number of worker threads started by start()
+        expiry -- seconds for which finished jobs are kept, and for
+        which unfinished jobs are kept after they are submitted
+        poll_interval -- seconds for which idle workers wait before
+        checking for new jobs
+        run_timeout -- seconds after which a running job is taken to
+        have been abandoned by its worker
+        max_attempts -- number of times a job is claimed before an
+        abandoned job is failed rather than queued again
+        """
+
+        self.path = path
+        self.workers = workers
+        self.expiry = expiry
+        self.poll_interval = poll_interval
+        self.run_timeout = run_timeout
+        self.max_attempts = max_attempts
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.last_purge = 0
+
+        conn = self.connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                     "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                     "spec TEXT NOT NULL, output TEXT NOT NULL, "
+                     "result BLOB, error TEXT, "
+                     "created REAL NOT NULL, finished REAL, "
+                     "claimed REAL, attempts INTEGER NOT NULL DEFAULT 0)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status "
+                     "ON jobs (status, created)")
+
+        # Add the columns for abandoned jobs to databases created
+        # before they were needed. Another process may be doing the
+        # same, so a column which already exists is not an error.
+
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        for column, decl in [("claimed", "REAL"),
+                             ("attempts", "INTEGER NOT NULL DEFAULT 0")]:
+            if column not in columns:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN %s %s" %
+                                 (column, decl))
+                except sqlite3.OperationalError:
+                    pass
+
+        conn.close()
+
+    def connect(self):
+
+        """
+        Returns a new connection to the database.
+
+        Connections are in autocommit mode, with transactions
+        started explicitly where needed.
+        """
+
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def start(self):
+
+        """
+        Starts the worker threads.
+        """
+
+        for num in range(self.workers):         # pylint: disable=W0612
+            thread = threading.Thread(target=self.work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, job):
+
+        """
+        Validates and queues a job, and returns its job ID.
+
+        Raises jobcalc.form.FormError if the job is invalid.
+
+        Arguments:
+        job -- dictionary of form field values
+        """
+
+        output = validate_job(job)["output"]
+        jobid = uuid.uuid4().hex
+
+        conn = self.connect()
+        conn.execute("INSERT INTO jobs (id, status, spec, output, created) "
+                     "VALUES (?, 'queued', ?, ?, ?)",
+                     (jobid, json.dumps(job), output, time.time()))
+        conn.close()
+
+        self.wakeup.set()
+        return jobid
+
+    def status(self, jobid):
+
+        """
+        Returns the status of a job, or None if it does not exist
+        or has expired.
+        """
+
+        conn = self.connect()
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?",
+                           (jobid,)).fetchone()
+        conn.close()
+
+        return row[0] if row else None
+
+    def result(self, jobid):
+
+        """
+        Returns a (status, output, data) tuple for a job.
+
+        'output' is the output type of the drawing. 'data' is the
+        drawing as bytes if the job is done, the error message if it
+        failed, and None otherwise. Returns None if the job does not
+        exist or has expired.
+        """
+
+        conn = self.connect()
+        row = conn.execute("SELECT status, output, result, error "
+                           "FROM jobs WHERE id = ?", (jobid,)).fetchone()
+        conn.close()
+
+        if row is None:
+            return None
+
+        status, output, result, error = row
+        if status == "done":
+            return (status, output, bytes(result))
+        elif status == "failed":
+            return (status, output, error)
+        else:
+            return (status, output, None)
+
+    def purge(self):
+
+        """
+        Recovers abandoned jobs, and deletes jobs older than the
+        expiry time.
+
+        Running jobs claimed longer ago than the run timeout are
+        queued again, or failed if they have been claimed the maximum
+        number of times. Finished jobs expire the expiry time after
+        they finished, and unfinished jobs the expiry time after they
+        were submitted.
+        """
+
+        now = time.time()
+        stale = now - self.run_timeout
+        cutoff = now - self.expiry
+
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE jobs SET status = 'failed', "
+                         "error = 'Render abandoned by its worker', "
+                         "finished = ? WHERE status = 'running' "
+                         "AND claimed < ? AND attempts >= ?",
+                         (now, stale, self.max_attempts))
+            conn.execute("UPDATE jobs SET status = 'queued', "
+                         "claimed = NULL WHERE status = 'running' "
+                         "AND claimed < ?", (stale,))
+            conn.execute("DELETE FROM jobs WHERE finished < ? OR "
+                         "(finished IS NULL AND created < ?)",
+                         (cutoff, cutoff))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self.last_purge = now
+
+    def claim(self, conn):
+
+        """
+        Claims the oldest queued job, and returns an (id, spec, claimed)
+        tuple, where 'claimed' is the time of the claim, or None if no
+        jobs are queued.
+        """
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id, spec FROM jobs "
+                               "WHERE status = 'queued' "
+                               "ORDER BY created LIMIT 1").fetchone()
+            if row:
+                claimed = time.time()
+                conn.execute("UPDATE jobs SET status = 'running', "
+                             "claimed = ?, attempts = attempts + 1 "
+                             "WHERE id = ?", (claimed, row[0]))
+                row = (row[0], row[1], claimed)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+        return row
+
+    def work(self):
+
+        """
+        Worker thread function, renders queued jobs until the
+        process exits.
+
+        Errors, e.g. when the database stays locked for longer than
+        the connection timeout, are logged, and the worker waits for
+        the poll interval and carries on. A job whose result could
+        not be stored is recovered by purge().
+        """
+
+        conn = self.connect()
+
+        while True:
+            try:
+                self.work_once(conn)
+            except Exception:                   # pylint: disable=W0703
+                log.exception("Render queue worker error")
+                time.sleep(self.poll_interval)
+
+    def work_once(self, conn):
+
+        """
+        Claims and renders one queued job, or waits for the poll
+        interval if no jobs are queued.
+
+        The result is only stored if the job is still running under
+        this worker's claim. A job which took longer than the run
+        timeout may have been queued again and claimed by another
+        worker, or failed as abandoned, and is left alone.
+
+        Arguments:
+        conn -- the worker's database connection
+        """
+
+        if time.time() - self.last_purge > self.poll_interval * 10:
+            self.purge()
+
+        row = self.claim(conn)
+        if row is None:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            return
+
+        jobid, spec, claimed = row
+
+        try:
+            page = page_from_form(DictForm(json.loads(spec)))[0]
+            if log.isEnabledFor(logging.DEBUG):
+                timer = StageTimer()
+                data = page.draw_bytes(timer)
+                log.debug("Rendered job %s", jobid)
+                timer.log(log)
+            else:
+                data = page.draw_bytes()
+        except Exception as err:            # pylint: disable=W0703
+            log.exception("Render of job %s failed", jobid)
+            cursor = conn.execute("UPDATE jobs SET status = 'failed', "
+                                  "error = ?, finished = ? WHERE id = ? "
+                                  "AND status = 'running' AND claimed = ?",
+                                  (str(err), time.time(), jobid, claimed))
+        else:
+            cursor = conn.execute("UPDATE jobs SET status = 'done', "
+                                  "result = ?, finished = ? WHERE id = ? "
+                                  "AND status = 'running' AND claimed = ?",
+                                  (sqlite3.Binary(data), time.time(),
+                                   jobid, claimed))
+
+        if cursor.rowcount == 0:
+            log.warning("Result of job %s discarded, since the job was "
+                        "recovered or expired while it was rendering", jobid)
@@ -0,0 +1,176 @@
+"""
+Provides a thread pool for drawing pages concurrently in one process.
+
+Drawing pages are not changed by drawing, so several can be drawn at
+once in threads of a single long-lived process. Pycairo releases the
+GIL while cairo rasterizes and encodes the output, so the threads can
+make use of more than one CPU core.
+
+Each submitted page returns a concurrent.futures.Future. The number of
+pages waiting to be drawn is bounded, so that submitting a large
+batch blocks rather than holding every page in memory at once.
+
+To use:
+
+  -- with RenderPool(threads=4) as pool:
+         future = pool.submit(page)
+         data = future.result()
+
+or, to draw a sequence of pages and get their output in order:
+
+  -- for data in pool.map(pages):
+         ...
+
+On Python 2, this requires the 'futures' package, which provides
+concurrent.futures.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import threading
+import multiprocessing
+from collections import deque
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+def default_threads():
+
+    """
+    Returns the default number of threads, one per CPU core.
+    """
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 2
+
+
+class RenderPool:
+
+    """
+    Class to draw pages in a bounded pool of threads.
+
+    Public methods:
+    __init__()
+    submit()
+    map()
+    shutdown()
+    """
+
+    def __init__(self, threads=None, max_pending=None):
+
+        """
+        Initializes a RenderPool instance.
+
+        Arguments:
+        threads -- number of drawing threads, defaults to the number
+        of CPU cores
+        max_pending -- maximum number of pages submitted but not yet
+        drawn, defaults to twice the number of threads. submit()
+        blocks until there is room.
+        """
+
+        if ThreadPoolExecutor is None:
+            raise RuntimeError("RenderPool needs concurrent.futures, "
+                               "install the 'futures' package")
+
+        self.threads = threads or default_threads()
+        self.max_pending = max_pending or self.threads * 2
+        self.pending = threading.BoundedSemaphore(self.max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+
+    def __enter__(self):
+
+        """
+        Returns the pool, for use in a 'with' statement.
+        """
+
+        return self
+
+    def __exit__(self, *args):
+
+        """
+        Shuts down the pool, waiting for submitted pages to be drawn.
+        """
+
+        self.shutdown()
+        return False
+
+    def submit(self, page, outfile=None):
+
+        """
+        Submits a page to be drawn, and returns a Future.
+
+        The result of the Future is the drawing as bytes, or None if
+        'outfile' is given. If drawing fails, the Future holds the
+        exception instead.
+
+        Blocks while the maximum number of pages are pending.
+
+        Arguments:
+        page -- a DrawingPage instance
+        outfile -- optional filename, or writable file object, to
+        draw the page to
+        """
+
+        self.pending.acquire()
+
+        try:
+            if outfile is None:
+                future = self.executor.submit(page.draw_bytes)
+            else:
+                future = self.executor.submit(page.draw, outfile)
+        except Exception:
+            self.pending.release()
+            raise
+
+        future.add_done_callback(lambda f: self.pending.release())
+        return future
+
+    def map(self, pages):
+
+        """
+        Draws a sequence of pages, and generates their drawings as
+        bytes in the same order.
+
+        Pages are only taken from 'pages' as there is room for them,
+        so it may be a generator of any length. Raises the exception
+        of the first page that fails to draw.
+
+        Arguments:
+        pages -- an iterable of DrawingPage instances
+        """
+
+        futures = deque()
+
+        for page in pages:
+
+            # Hand back finished drawings before submitting more,
+            # so that futures do not build up while we block.
+
+            while futures and (futures[0].done() or
+                               len(futures) >= self.max_pending):
+                yield futures.popleft().result()
+            futures.append(self.submit(page))
+
+        while futures:
+            yield futures.popleft().result()
+
+    def shutdown(self, wait=True):
+
+        """
+        Shuts down the pool.
+
+        Arguments:
+        wait -- True to wait for submitted pages to be drawn
+        """
+
+        self.executor.shutdown(wait=wait)
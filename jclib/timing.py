@@ -0,0 +1,243 @@
+"""
+Provides optional timing of the stages of drawing a page.
+
+Drawing code marks out its stages with:
+
+  -- with stage("draw_flanges"):
+         ...
+
+which does nothing unless a StageTimer is active in the current
+thread, so the stages cost almost nothing when timing is not wanted.
+To time a drawing, pass a timer to the drawing page:
+
+  -- timer = StageTimer()
+  -- page.draw(outfile, timer=timer)
+  -- timer.totals()
+  -- timer.log(logger)
+
+Stages may be nested, and nested stages are named by their path,
+e.g. "component/draw_component/draw_flanges". Both wall clock and CPU
+time are recorded for each stage.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import time
+import logging
+import threading
+from timeit import default_timer
+from collections import OrderedDict
+
+
+# Use the most precise CPU clock available, preferring one which
+# only counts time spent in the current thread.
+
+try:
+    cpu_clock = time.thread_time
+except AttributeError:
+    try:
+        cpu_clock = time.process_time
+    except AttributeError:
+        cpu_clock = time.clock
+
+current = threading.local()
+
+
+class NullStage:
+
+    """
+    Class for a stage which is not timed.
+
+    A single instance is shared by all untimed stages.
+    """
+
+    def __enter__(self):
+
+        """
+        Does nothing.
+        """
+
+        return self
+
+    def __exit__(self, *args):
+
+        """
+        Does nothing.
+        """
+
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+
+    """
+    Class for a stage being timed.
+
+    Public methods:
+    __init__()
+    """
+
+    def __init__(self, timer, name):
+
+        """
+        Initializes a Stage instance.
+
+        Arguments:
+        timer -- the StageTimer recording the stage
+        name -- the name of the stage
+        """
+
+        self.timer = timer
+        self.name = name
+        self.index = None
+        self.wall = 0
+        self.cpu = 0
+
+    def __enter__(self):
+
+        """
+        Starts timing the stage.
+        """
+
+        self.timer.path.append(self.name)
+        self.index = self.timer.record("/".join(self.timer.path), 0, 0)
+        self.wall = default_timer()
+        self.cpu = cpu_clock()
+        return self
+
+    def __exit__(self, *args):
+
+        """
+        Stops timing the stage and records the times taken.
+        """
+
+        wall = default_timer() - self.wall
+        cpu = cpu_clock() - self.cpu
+        self.timer.record("/".join(self.timer.path), wall, cpu, self.index)
+        self.timer.path.pop()
+        return False
+
+
+class StageTimer:
+
+    """
+    Class to record the time taken by each stage of a drawing.
+
+    Public methods:
+    __init__()
+    activate()
+    deactivate()
+    stage()
+    record()
+    totals()
+    log()
+    """
+
+    def __init__(self):
+
+        """
+        Initializes a StageTimer instance.
+        """
+
+        self.timings = []
+        self.path = []
+        self.previous = None
+
+    def activate(self):
+
+        """
+        Makes this the timer for stages in the current thread.
+        """
+
+        self.previous = getattr(current, "timer", None)
+        current.timer = self
+
+    def deactivate(self):
+
+        """
+        Restores the timer which was active before activate().
+        """
+
+        current.timer = self.previous
+        self.previous = None
+
+    def stage(self, name):
+
+        """
+        Returns a context manager timing a stage.
+        """
+
+        return Stage(self, name)
+
+    def record(self, name, wall, cpu, index=None):
+
+        """
+        Records the time taken by a stage, and returns the index of
+        the record.
+
+        Arguments:
+        name -- the path name of the stage
+        wall -- wall clock time, in seconds
+        cpu -- CPU time, in seconds
+        index -- optional index of an earlier record to replace,
+        so that stages are kept in the order in which they started
+        """
+
+        if index is None:
+            self.timings.append((name, wall, cpu))
+            return len(self.timings) - 1
+
+        self.timings[index] = (name, wall, cpu)
+        return index
+
+    def totals(self):
+
+        """
+        Returns an ordered dictionary of (wall, cpu) time tuples keyed
+        by stage name, in the order the stages started.
+
+        Stages which ran more than once have their times added.
+        """
+
+        totals = OrderedDict()
+        for name, wall, cpu in self.timings:
+            old_wall, old_cpu = totals.get(name, (0, 0))
+            totals[name] = (old_wall + wall, old_cpu + cpu)
+        return totals
+
+    def log(self, logger, level=logging.DEBUG):
+
+        """
+        Writes the stage timings to a logger, one line per stage.
+
+        Arguments:
+        logger -- a logging.Logger instance
+        level -- the logging level to use
+        """
+
+        for name, (wall, cpu) in self.totals().items():
+            logger.log(level, "%s: %.3fms wall, %.3fms cpu",
+                       name, wall * 1000, cpu * 1000)
+
+
+def stage(name):
+
+    """
+    Returns a context manager timing a stage, if a timer is active
+    in the current thread, or one which does nothing if not.
+
+    Arguments:
+    name -- the name of the stage
+    """
+
+    timer = getattr(current, "timer", None)
+    if timer is None:
+        return NULL_STAGE
+    return timer.stage(name)
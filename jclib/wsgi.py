@@ -0,0 +1,503 @@
+"""
+Provides a WSGI application for JobCalc.
+
+The application accepts the same form input as the CGI entry point,
+but runs in a long-lived process, so the jobcalc package, Pycairo and
+the font configuration are loaded once rather than for every drawing.
+
+To use, point a WSGI server at:
+
+  -- jobcalc.wsgi.application
+
+Rendered drawings are cached in memory, and also on disk if the
+JOBCALC_CACHE_DIR environment variable names a directory. The size of
+the on-disk cache, in megabytes, can be set with JOBCALC_CACHE_MB.
+
+Drawings are returned directly for requests to the application root.
+Slow drawings can instead be rendered in the background:
+
+  -- POST /jobs queues a drawing and returns its job ID as JSON
+  -- GET /jobs/<id> returns the drawing when it is ready, or the
+     status of the job as JSON while it is not
+
+Many drawings can be downloaded at once as a ZIP archive:
+
+  -- POST /batch with a JSON array of jobs, or JSON lines with one
+     job per line, returns the drawings as a ZIP archive
+
+Jobs use the form field names, plus an optional "outfile" naming the
+file in the archive. All the jobs are validated before any are drawn,
+and the archive is streamed as each drawing is finished, so memory
+use does not grow with the number of drawings. Jobs which fail to
+draw are listed in an "errors.txt" file at the end of the archive.
+At most JOBCALC_BATCH_MAX_JOBS jobs are accepted in one request.
+
+A small PNG of just the component outline, quick enough to redraw
+as the form changes, is returned for requests to /preview, which
+takes the same form input as the application root.
+
+The render queue is kept in the SQLite database named by
+JOBCALC_QUEUE_DB, rendered by JOBCALC_QUEUE_WORKERS worker threads per
+process, and results are kept for JOBCALC_RESULT_TTL seconds. Jobs
+left running for JOBCALC_RUN_TIMEOUT seconds, e.g. by a worker whose
+process was killed, are queued again.
+
+When the "jobcalc.wsgi" logger is enabled for debug messages, the time
+taken by each stage of each drawing is logged.
+
+Request counts, drawing latencies and sizes, and validation failures
+are served in the Prometheus text format at /metrics, to local
+clients only.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import cgi
+import json
+from io import BytesIO
+import logging
+import tempfile
+import threading
+from timeit import default_timer
+from jobcalc.form import page_from_form, page_from_spec
+from jobcalc.form import component_from_spec
+from jobcalc.form import FormError, CONTENT_TYPES
+from jobcalc.jobspec import validate_many, validate_job
+from jobcalc.jobspec import output_name, unused_name
+from jobcalc.htmlerror import html_error
+from jobcalc.cache import RenderCache
+from jobcalc.renderqueue import RenderQueue
+from jobcalc.timing import StageTimer
+from jobcalc.metrics import MetricsRegistry, LATENCY_BUCKETS, SIZE_BUCKETS
+from jobcalc.zipstream import stream_zip
+
+
+log = logging.getLogger(__name__)
+
+BATCH_MAX_JOBS = int(os.environ.get("JOBCALC_BATCH_MAX_JOBS", 1000))
+
+# Clients allowed to read /metrics
+
+METRICS_ADDRESSES = ["127.0.0.1", "::1"]
+
+metrics = MetricsRegistry()
+requests_total = metrics.counter("jobcalc_requests_total",
+                    "Requests handled, by route and HTTP status code.",
+                    ["route", "code"])
+render_seconds = metrics.histogram("jobcalc_render_seconds",
+                    "Time taken to render or fetch from cache a drawing.",
+                    LATENCY_BUCKETS, ["jobtype", "otype"])
+output_bytes = metrics.histogram("jobcalc_output_bytes",
+                    "Size of drawings returned.",
+                    SIZE_BUCKETS, ["jobtype", "otype"])
+validation_failures = metrics.counter("jobcalc_validation_failures_total",
+                    "Requests rejected because of invalid form input.",
+                    ["route"])
+
+render_cache = RenderCache(
+    cache_dir=os.environ.get("JOBCALC_CACHE_DIR"),
+    max_disk_bytes=int(os.environ.get("JOBCALC_CACHE_MB", 256)) * 1024 * 1024)
+
+# The render queue is only created, and its workers started, when
+# it is first used.
+
+render_queue = None
+render_queue_lock = threading.Lock()
+
+
+def get_render_queue():
+
+    """
+    Returns the render queue, creating and starting it if necessary.
+    """
+
+    global render_queue         # pylint: disable=W0603
+
+    with render_queue_lock:
+        if render_queue is None:
+            path = os.environ.get("JOBCALC_QUEUE_DB",
+                        os.path.join(tempfile.gettempdir(), "jobcalc.db"))
+            workers = int(os.environ.get("JOBCALC_QUEUE_WORKERS", 2))
+            expiry = int(os.environ.get("JOBCALC_RESULT_TTL", 3600))
+            timeout = int(os.environ.get("JOBCALC_RUN_TIMEOUT", 300))
+            render_queue = RenderQueue(path, workers=workers, expiry=expiry,
+                                       run_timeout=timeout)
+            render_queue.start()
+
+    return render_queue
+
+
+def get_form(environ):
+
+    """
+    Returns a cgi.FieldStorage instance for a WSGI request.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    """
+
+    # FieldStorage reads the query string itself for GET and HEAD
+    # requests, so only give it the request body for other methods.
+
+    if environ.get("REQUEST_METHOD", "GET") in ["GET", "HEAD"]:
+        fp = None
+    else:
+        fp = environ["wsgi.input"]
+
+    return cgi.FieldStorage(fp=fp, environ=environ)
+
+
+def respond(start_response, status, content_type, body):
+
+    """
+    Starts a WSGI response and returns the response body iterable.
+
+    Arguments:
+    start_response -- the WSGI start_response callable
+    status -- HTTP status string, e.g. "200 OK"
+    content_type -- value for the Content-Type header
+    body -- bytes of the response body
+    """
+
+    start_response(status, [("Content-Type", content_type),
+                            ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def respond_json(start_response, status, value):
+
+    """
+    Starts a WSGI response with a JSON body, and returns the body.
+
+    Arguments:
+    start_response -- the WSGI start_response callable
+    status -- HTTP status string, e.g. "200 OK"
+    value -- the value to encode as JSON
+    """
+
+    return respond(start_response, status, "application/json",
+                   json.dumps(value).encode("utf-8"))
+
+
+def application(environ, start_response):
+
+    """
+    WSGI application entry point, dispatches on the request path.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    path = environ.get("PATH_INFO", "").rstrip("/")
+    codes = []
+
+    def counted_start_response(status, headers, exc_info=None):
+
+        """
+        Records the status code of the response and starts it.
+        """
+
+        codes.append(status.split(None, 1)[0])
+        return start_response(status, headers, exc_info)
+
+    # Requests are counted even if the handler raises, and counted
+    # as server errors if it did so before starting a response.
+
+    try:
+        if path == "/metrics":
+            route = "metrics"
+            body = serve_metrics(environ, counted_start_response)
+        elif path == "/preview":
+            route = "preview"
+            body = draw_preview(environ, counted_start_response)
+        elif path == "/batch":
+            route = "batch"
+            body = draw_batch(environ, counted_start_response)
+        elif path == "/jobs":
+            route = "submit"
+            body = submit_job(environ, counted_start_response)
+        elif path.startswith("/jobs/"):
+            route = "fetch"
+            body = fetch_job(environ, counted_start_response,
+                             path[len("/jobs/"):])
+        else:
+            route = "draw"
+            body = draw(environ, counted_start_response)
+    finally:
+        requests_total.inc([route, codes[-1] if codes else "500"])
+
+    return body
+
+
+def draw(environ, start_response):
+
+    """
+    Draws a page from form input and returns it.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    form = get_form(environ)
+
+    try:
+        page, output = page_from_form(form)
+    except FormError as err:
+        validation_failures.inc(["draw"])
+        return respond(start_response, "400 Bad Request", "text/html",
+                       html_error("<br>\n".join(err.errors)).encode("utf-8"))
+
+    start = default_timer()
+
+    if log.isEnabledFor(logging.DEBUG):
+        timer = StageTimer()
+        data = render_cache.render(page, timer)
+        timer.log(log)
+    else:
+        data = render_cache.render(page)
+
+    labels = [form.getvalue("jobtype"), output]
+    render_seconds.observe(default_timer() - start, labels)
+    output_bytes.observe(len(data), labels)
+
+    return respond(start_response, "200 OK", CONTENT_TYPES[output], data)
+
+
+def draw_preview(environ, start_response):
+
+    """
+    Draws a PNG preview of the component outline from form input
+    and returns it.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    form = get_form(environ)
+
+    try:
+        spec = validate_job(form)
+    except FormError as err:
+        validation_failures.inc(["preview"])
+        return respond(start_response, "400 Bad Request", "text/html",
+                       html_error("<br>\n".join(err.errors)).encode("utf-8"))
+
+    # Imported here, as in jobcalc.form, so that Pycairo is only
+    # loaded once input has passed validation.
+
+    from jobcalc import page
+
+    start = default_timer()
+
+    outfile = BytesIO()
+    page.draw_preview(component_from_spec(spec), outfile)
+    data = outfile.getvalue()
+
+    labels = [spec["jobtype"], "preview"]
+    render_seconds.observe(default_timer() - start, labels)
+    output_bytes.observe(len(data), labels)
+
+    return respond(start_response, "200 OK", CONTENT_TYPES["png"], data)
+
+
+def serve_metrics(environ, start_response):
+
+    """
+    Returns the metrics in the Prometheus text exposition format.
+
+    Only clients on the local machine may read the metrics.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    if environ.get("REMOTE_ADDR") not in METRICS_ADDRESSES:
+        return respond(start_response, "403 Forbidden", "text/html",
+                       html_error("Metrics are only available "
+                                  "locally.").encode("utf-8"))
+
+    return respond(start_response, "200 OK",
+                   "text/plain; version=0.0.4; charset=utf-8",
+                   metrics.render().encode("utf-8"))
+
+
+def read_jobs(environ):
+
+    """
+    Returns the list of jobs in the body of a batch request.
+
+    The body is either a JSON array of job objects, or JSON lines
+    with one job object per line. Raises ValueError if it is neither.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    """
+
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    body = environ["wsgi.input"].read(length).decode("utf-8")
+
+    if body.lstrip().startswith("["):
+        jobs = json.loads(body)
+    else:
+        jobs = [json.loads(line) for line in body.splitlines()
+                if line.strip()]
+
+    if not jobs or not all(isinstance(job, dict) for job in jobs):
+        raise ValueError("Expected a list of job objects.")
+
+    return jobs
+
+
+def batch_files(jobs, specs):
+
+    """
+    Generates (name, data) tuples of the drawings of a batch, for
+    the ZIP archive, drawing each only when it is needed.
+
+    Names are unique within the archive. Jobs which fail to draw are
+    left out, and listed with their errors in a final "errors.txt"
+    file, since the response has already started.
+
+    Arguments:
+    jobs -- the list of job dictionaries
+    specs -- the list of validated job specifications
+    """
+
+    names = set()
+    errors = []
+
+    for num, (job, spec) in enumerate(zip(jobs, specs), 1):
+        name = output_name(job, spec, num, names)
+
+        try:
+            data = page_from_spec(spec).draw_bytes()
+        except Exception as err:            # pylint: disable=W0703
+            log.exception("Drawing of batch job %d failed", num)
+            errors.append("job %d (%s): %s: %s" %
+                          (num, name, err.__class__.__name__, err))
+            names.discard(name)
+            continue
+
+        output_bytes.observe(len(data), [spec["jobtype"], spec["output"]])
+        yield (name, data)
+
+    if errors:
+        yield (unused_name(names, "errors", "txt"),
+               ("\n".join(errors) + "\n").encode("utf-8"))
+
+
+def draw_batch(environ, start_response):
+
+    """
+    Draws a batch of jobs and returns them as a streamed ZIP archive.
+
+    All the jobs are validated first, and if any are invalid, the
+    errors for each invalid job are returned as JSON instead.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    if environ.get("REQUEST_METHOD") != "POST":
+        return respond(start_response, "405 Method Not Allowed",
+                       "text/html", html_error("Use POST to submit "
+                                               "batches.").encode("utf-8"))
+
+    try:
+        jobs = read_jobs(environ)
+    except ValueError as err:
+        return respond(start_response, "400 Bad Request", "text/html",
+                       html_error("Bad batch &mdash; %s" % err
+                                  ).encode("utf-8"))
+
+    if len(jobs) > BATCH_MAX_JOBS:
+        return respond(start_response, "413 Request Entity Too Large",
+                       "text/html",
+                       html_error("No more than %d jobs may be submitted "
+                                  "at once." % BATCH_MAX_JOBS
+                                  ).encode("utf-8"))
+
+    results = validate_many(jobs)
+    invalid = [{"job": num, "errors": errors}
+               for num, (spec, errors) in enumerate(results, 1) if errors]
+
+    if invalid:
+        validation_failures.inc(["batch"], len(invalid))
+        return respond_json(start_response, "400 Bad Request",
+                            {"invalid": invalid})
+
+    start_response("200 OK", [("Content-Type", "application/zip"),
+                              ("Content-Disposition",
+                               "attachment; filename=drawings.zip")])
+    return stream_zip(batch_files(jobs, [r[0] for r in results]))
+
+
+def submit_job(environ, start_response):
+
+    """
+    Queues a drawing from form input, and returns its job ID.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    """
+
+    if environ.get("REQUEST_METHOD") != "POST":
+        return respond(start_response, "405 Method Not Allowed",
+                       "text/html", html_error("Use POST to submit jobs."
+                                               ).encode("utf-8"))
+
+    form = get_form(environ)
+    job = dict((k, form.getvalue(k)) for k in form.keys())
+
+    try:
+        jobid = get_render_queue().submit(job)
+    except FormError as err:
+        validation_failures.inc(["submit"])
+        return respond(start_response, "400 Bad Request", "text/html",
+                       html_error("<br>\n".join(err.errors)).encode("utf-8"))
+
+    return respond_json(start_response, "202 Accepted",
+                        {"id": jobid, "status": "queued"})
+
+
+def fetch_job(environ, start_response, jobid):
+
+    """
+    Returns a queued drawing if it is ready, or the job status if not.
+
+    Arguments:
+    environ -- the WSGI environment dictionary
+    start_response -- the WSGI start_response callable
+    jobid -- the ID returned when the job was submitted
+    """
+
+    result = get_render_queue().result(jobid)
+
+    if result is None:
+        return respond(start_response, "404 Not Found", "text/html",
+                       html_error("Unknown or expired job!").encode("utf-8"))
+
+    status, output, data = result
+
+    if status == "done":
+        return respond(start_response, "200 OK", CONTENT_TYPES[output], data)
+    elif status == "failed":
+        return respond(start_response, "500 Internal Server Error",
+                       "text/html", html_error(data).encode("utf-8"))
+    else:
+        return respond_json(start_response, "202 Accepted",
+                            {"id": jobid, "status": status})
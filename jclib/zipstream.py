@@ -0,0 +1,139 @@
+"""
+Provides a ZIP archive writer which streams its output.
+
+The archive is written a file at a time, and the bytes written so far
+are returned after each file, so that they can be sent on straight
+away, e.g. as the chunks of a WSGI response. Only one file's data is
+held in memory at a time, however many files the archive holds.
+
+To use:
+
+  -- for chunk in stream_zip(files):
+         ...
+
+where 'files' is an iterable of (name, data) tuples.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import time
+import zipfile
+
+
+# Output types which are already compressed, and are stored in the
+# archive as they are, rather than compressed again.
+
+STORED_TYPES = ["pdf", "png"]
+
+
+class ZipBuffer:
+
+    """
+    Class for a write-only file object collecting ZIP archive output.
+
+    The zipfile module needs to know the position in the output, so
+    this keeps count of the bytes written, including those already
+    taken. It cannot seek, so zipfile writes each file's sizes after
+    its data.
+
+    Public methods:
+    __init__()
+    write()
+    tell()
+    flush()
+    take()
+    """
+
+    def __init__(self):
+
+        """
+        Initializes a ZipBuffer instance.
+        """
+
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+
+        """
+        Writes bytes to the buffer.
+        """
+
+        self.chunks.append(data)
+        self.position += len(data)
+
+    def tell(self):
+
+        """
+        Returns the number of bytes written.
+        """
+
+        return self.position
+
+    def flush(self):
+
+        """
+        Does nothing, as there is nothing to flush.
+        """
+
+        pass
+
+    def take(self):
+
+        """
+        Returns the bytes written since the last call, and empties
+        the buffer.
+        """
+
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_info(name):
+
+    """
+    Returns a zipfile.ZipInfo instance for a file in the archive.
+
+    Files whose extension is in STORED_TYPES are stored, and all
+    others are compressed.
+
+    Arguments:
+    name -- the name of the file in the archive
+    """
+
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    info.external_attr = 0o644 << 16
+    if name.rsplit(".", 1)[-1].lower() in STORED_TYPES:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_zip(files):
+
+    """
+    Generates the bytes of a ZIP archive, a file at a time.
+
+    Each file is only read from 'files' once the previous file has
+    been written and its bytes returned.
+
+    Arguments:
+    files -- an iterable of (name, data) tuples, where 'data' is
+    the contents of the file as bytes
+    """
+
+    buf = ZipBuffer()
+    archive = zipfile.ZipFile(buf, "w")
+
+    for name, data in files:
+        archive.writestr(zip_info(name), data)
+        yield buf.take()
+
+    archive.close()
+    yield buf.take()
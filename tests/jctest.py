@@ -0,0 +1,78 @@
+"""
+Shared helpers for the JobCalc tests.
+
+Importing this module makes the jobcalc package importable from the
+source tree, where its directory is named 'jclib', if it is not
+already installed.
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import sys
+
+
+def load_package():
+
+    """
+    Imports the jobcalc package from the source tree, where its
+    directory is named 'jclib', if it is not already installed.
+    """
+
+    try:
+        import jobcalc                      # pylint: disable=W0612
+        return
+    except ImportError:
+        pass
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, "jclib")
+
+    if sys.version_info[0] < 3:
+        import imp
+        imp.load_package("jobcalc", path)
+    else:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(
+            "jobcalc", os.path.join(path, "__init__.py"),
+            submodule_search_locations=[path])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["jobcalc"] = module
+        spec.loader.exec_module(module)
+
+
+def have_cairo():
+
+    """
+    Returns True if Pycairo is available, for tests which draw.
+    """
+
+    try:
+        import cairo                        # pylint: disable=W0612
+        return True
+    except ImportError:
+        return False
+
+
+def bend_job(**fields):
+
+    """
+    Returns a valid pipe bend job dictionary, with any fields given
+    as keyword arguments added or replaced.
+    """
+
+    job = {"jobtype": "pipebend", "casing": "segmented",
+           "casingod": "200", "casingid": "180",
+           "liningod": "160", "liningid": "140",
+           "nomrad": "500", "bendangle": "45", "segangle": "15",
+           "flange": "200PN16", "output": "pdf", "outputsize": "A4",
+           "qty": "1", "title": "Test bend"}
+    job.update(fields)
+    return job
+
+
+load_package()
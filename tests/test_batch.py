@@ -0,0 +1,127 @@
+"""
+Tests for jobcalc.batch and the naming of batch output files.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import jctest
+from jobcalc.jobspec import output_name, unused_name
+from jobcalc.batch import render_batch
+
+
+SPEC = {"output": "pdf"}
+
+
+class OutputNameTest(unittest.TestCase):
+
+    """
+    Tests for output_name() and unused_name().
+    """
+
+    def test_requested_name(self):
+
+        """
+        A requested name is used and recorded.
+        """
+
+        names = set()
+        self.assertEqual(output_name({"outfile": "a.pdf"}, SPEC, 1, names),
+                         "a.pdf")
+        self.assertEqual(names, set(["a.pdf"]))
+
+    def test_default_name(self):
+
+        """
+        Jobs without a name are named from their job number.
+        """
+
+        self.assertEqual(output_name({}, SPEC, 7, set()), "job0007.pdf")
+
+    def test_directories_removed(self):
+
+        """
+        Only the last part of a requested name is used.
+        """
+
+        for outfile in ["/etc/a.pdf", "../a.pdf", "x/../../a.pdf",
+                        "..\\a.pdf", "C:\\temp\\a.pdf"]:
+            self.assertEqual(output_name({"outfile": outfile},
+                                         SPEC, 1, set()), "a.pdf")
+        for outfile in ["..", ".", "x/", "../"]:
+            self.assertEqual(output_name({"outfile": outfile},
+                                         SPEC, 1, set()), "job0001.pdf")
+
+    def test_duplicates(self):
+
+        """
+        Names already used are replaced with numbered names.
+        """
+
+        names = set()
+        found = [output_name(job, SPEC, num, names) for num, job in
+                 enumerate([{"outfile": "a.pdf"}, {"outfile": "a.pdf"},
+                            {"outfile": "job0002.pdf"}, {}], 1)]
+        self.assertEqual(found, ["a.pdf", "job0002.pdf",
+                                 "job0003.pdf", "job0004.pdf"])
+        self.assertEqual(unused_name(names, "a", "pdf"), "a-2.pdf")
+
+
+@unittest.skipUnless(jctest.have_cairo(), "Pycairo is not available")
+class RenderBatchTest(unittest.TestCase):
+
+    """
+    Tests for render_batch().
+    """
+
+    def setUp(self):
+
+        """
+        Creates a temporary output directory.
+        """
+
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        """
+        Removes the temporary output directory.
+        """
+
+        shutil.rmtree(self.outdir)
+
+    def test_names(self):
+
+        """
+        Drawings are written inside the output directory with unique
+        names, and invalid jobs are reported without being drawn.
+        """
+
+        jobs = [jctest.bend_job(outfile="../a.pdf"),
+                jctest.bend_job(outfile="a.pdf"),
+                jctest.bend_job(casingod="x")]
+        results = render_batch(jobs, self.outdir, 1)
+
+        self.assertEqual([r[0] for r in results], [1, 2, 3])
+        self.assertEqual([r[1] for r in results],
+                         [os.path.join(self.outdir, "a.pdf"),
+                          os.path.join(self.outdir, "job0002.pdf"), None])
+        self.assertEqual([r[3] for r in results],
+                         [None, None, "Bad value for casingod!"])
+        self.assertEqual(sorted(os.listdir(self.outdir)),
+                         ["a.pdf", "job0002.pdf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
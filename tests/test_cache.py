@@ -0,0 +1,282 @@
+"""
+Tests for jobcalc.cache.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import jctest                               # pylint: disable=W0611
+from jobcalc import cache
+from jobcalc.cache import RenderCache, page_key
+
+
+# pylint: disable=R0903
+
+
+class Value:
+
+    """
+    Stands in for helper.LabeledValue in a page's drawing information.
+    """
+
+    def __init__(self, value):
+
+        """
+        Initializes a Value instance.
+        """
+
+        self.value = value
+
+
+class Component:
+
+    """
+    Stands in for a component, with its construction parameters.
+    """
+
+    def __init__(self, params):
+
+        """
+        Initializes a Component instance.
+        """
+
+        self.params = params
+
+
+class Page:
+
+    """
+    Stands in for a DrawingPage, counting how often it is drawn.
+    """
+
+    def __init__(self, params, otype="pdf"):
+
+        """
+        Initializes a Page instance.
+        """
+
+        self.component = Component(params)
+        self.output_type = otype
+        self.output_size = "A4"
+        self.client = "Client"
+        self.drg_info = {"title": Value("Bend"), "scale": Value("1:10")}
+        self.draws = 0
+
+    def draw_bytes(self, timer=None):       # pylint: disable=W0613
+
+        """
+        Returns fake drawing bytes.
+        """
+
+        self.draws += 1
+        return ("%s %s" % (self.component.params,
+                           self.output_type)).encode("utf-8")
+
+
+# pylint: enable=R0903
+
+
+def key(num):
+
+    """
+    Returns a key in the format of page_key() for a number.
+    """
+
+    return "%040x" % num
+
+
+class PageKeyTest(unittest.TestCase):
+
+    """
+    Tests for page_key().
+    """
+
+    def test_key_format(self):
+
+        """
+        Keys are 40 hexadecimal digits, and differ with the output.
+        """
+
+        first = page_key(Page([1, 2]))
+        self.assertTrue(cache.KEY_PATTERN.match(first))
+        self.assertEqual(first, page_key(Page([1, 2])))
+        self.assertNotEqual(first, page_key(Page([1, 3])))
+        self.assertNotEqual(first, page_key(Page([1, 2], "svg")))
+
+    def test_scale_ignored(self):
+
+        """
+        The drawing scale, calculated while drawing, is not hashed.
+        """
+
+        page = Page([1, 2])
+        first = page_key(page)
+        page.drg_info["scale"] = Value("1:20")
+        self.assertEqual(first, page_key(page))
+
+    def test_version(self):
+
+        """
+        Changing the cache version changes every key.
+        """
+
+        first = page_key(Page([1, 2]))
+        saved = cache.CACHE_VERSION
+        cache.CACHE_VERSION = saved + 1
+        try:
+            self.assertNotEqual(first, page_key(Page([1, 2])))
+        finally:
+            cache.CACHE_VERSION = saved
+
+
+class MemoryTierTest(unittest.TestCase):
+
+    """
+    Tests for the in-memory tier.
+    """
+
+    def test_render_once(self):
+
+        """
+        A page is drawn only once while it stays cached.
+        """
+
+        store = RenderCache()
+        page = Page([1, 2])
+        data = store.render(page)
+        self.assertEqual(store.render(page), data)
+        self.assertEqual(page.draws, 1)
+
+    def test_least_recently_used(self):
+
+        """
+        The least recently used entry is evicted when full.
+        """
+
+        store = RenderCache(max_items=2)
+        store.put(key(1), b"one")
+        store.put(key(2), b"two")
+        store.get(key(1))
+        store.put(key(3), b"three")
+        self.assertEqual(store.get(key(1)), b"one")
+        self.assertEqual(store.get(key(2)), None)
+        self.assertEqual(store.get(key(3)), b"three")
+
+
+class DiskTierTest(unittest.TestCase):
+
+    """
+    Tests for the on-disk tier.
+    """
+
+    def setUp(self):
+
+        """
+        Creates a temporary cache directory.
+        """
+
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        """
+        Removes the temporary cache directory.
+        """
+
+        shutil.rmtree(self.cache_dir)
+
+    def age(self, num, mtime):
+
+        """
+        Sets the modification time of a cached file.
+        """
+
+        os.utime(os.path.join(self.cache_dir, key(num)), (mtime, mtime))
+
+    def test_shared_between_instances(self):
+
+        """
+        Drawings on disk are found by a new cache, and promoted to
+        its memory tier.
+        """
+
+        RenderCache(cache_dir=self.cache_dir).put(key(1), b"one")
+        store = RenderCache(cache_dir=self.cache_dir)
+        self.assertEqual(store.get(key(1)), b"one")
+        self.assertTrue(key(1) in store.memory)
+
+    def test_eviction(self):
+
+        """
+        The least recently used files are removed once the tier is
+        over its size limit, and the running total is kept.
+        """
+
+        store = RenderCache(max_items=1, cache_dir=self.cache_dir,
+                            max_disk_bytes=10)
+        store.put(key(1), b"1111")
+        store.put(key(2), b"2222")
+        self.age(1, 1000)
+        self.age(2, 2000)
+        self.assertEqual(store.disk_bytes, 8)
+
+        store.put(key(3), b"3333")
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         [key(2), key(3)])
+        self.assertEqual(store.disk_bytes, 8)
+
+    def test_replace_counted_once(self):
+
+        """
+        Storing a key again counts only the size of the new file.
+        """
+
+        store = RenderCache(cache_dir=self.cache_dir)
+        store.put(key(1), b"1111")
+        store.put(key(1), b"11")
+        self.assertEqual(store.disk_bytes, 2)
+
+    def test_no_scan_under_limit(self):
+
+        """
+        The directory is scanned on the first store, but not again
+        while the running total is under the limit.
+        """
+
+        store = RenderCache(cache_dir=self.cache_dir)
+        store.put(key(1), b"one")
+        scans = []
+        store.disk_evict = lambda: scans.append(True)
+        store.put(key(2), b"two")
+        self.assertEqual(scans, [])
+
+    def test_other_files_kept(self):
+
+        """
+        Files not named like cache keys are neither counted nor
+        removed.
+        """
+
+        other = os.path.join(self.cache_dir, "notes.txt")
+        with open(other, "wb") as outfile:
+            outfile.write(b"x" * 100)
+
+        store = RenderCache(cache_dir=self.cache_dir, max_disk_bytes=10)
+        store.put(key(1), b"one")
+        self.assertTrue(os.path.exists(other))
+        self.assertEqual(store.disk_bytes, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
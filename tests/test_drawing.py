@@ -0,0 +1,127 @@
+"""
+Tests that drawing leaves components and pages unchanged.
+
+These tests need Pycairo, and are skipped without it.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import unittest
+import jctest
+from jobcalc.jobspec import validate_job
+
+
+def snapshot(value):
+
+    """
+    Returns a copy of a value which can be compared with a later copy,
+    following the attributes of jobcalc objects, and recording other
+    objects, such as Pycairo ones, by type only.
+    """
+
+    if isinstance(value, dict):
+        return dict((k, snapshot(v)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return [snapshot(v) for v in value]
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif getattr(value.__class__, "__module__", "").startswith("jobcalc"):
+        return (value.__class__.__name__, snapshot(vars(value)))
+    else:
+        return value.__class__.__name__
+
+
+def make_page(**fields):
+
+    """
+    Returns a drawing page for a job, as for the bend in jctest.
+    """
+
+    from jobcalc.form import page_from_spec
+    return page_from_spec(validate_job(jctest.bend_job(**fields)))
+
+
+@unittest.skipUnless(jctest.have_cairo(), "Pycairo is not available")
+class DrawUnchangedTest(unittest.TestCase):
+
+    """
+    Tests that components and pages may be drawn again.
+    """
+
+    def check_redraw(self, **fields):
+
+        """
+        Draws a page twice, checking that it and its component are
+        unchanged and that both drawings are the same.
+        """
+
+        page = make_page(**fields)
+        before = snapshot(page)
+        first = page.draw_bytes()
+        self.assertEqual(snapshot(page), before)
+        self.assertEqual(page.draw_bytes(), first)
+        self.assertEqual(snapshot(page), before)
+
+    def test_bend(self):
+
+        """
+        Segmented bends, with segment dimensions.
+        """
+
+        self.check_redraw(output="png", segdim=["drg", "box"])
+
+    def test_onepiece_bend(self):
+
+        """
+        One piece bends, as SVG.
+        """
+
+        self.check_redraw(output="svg", casing="onepiece")
+
+    def test_straight(self):
+
+        """
+        Straight pipes.
+        """
+
+        self.check_redraw(jobtype="pipestraight", length="3000",
+                          output="png")
+
+    def test_formats(self):
+
+        """
+        A component drawn in one format and then another draws the
+        same as a new one.
+        """
+
+        page = make_page(output="svg")
+        page.draw_bytes()
+        page.output_type = "png"
+        self.assertEqual(page.draw_bytes(),
+                         make_page(output="png").draw_bytes())
+
+    def test_preview(self):
+
+        """
+        Previews leave the component unchanged.
+        """
+
+        from io import BytesIO
+        from jobcalc.page import draw_preview
+
+        component = make_page().component
+        before = snapshot(component)
+        draw_preview(component, BytesIO())
+        self.assertEqual(snapshot(component), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Tests for jobcalc.geometry.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import unittest
+import jctest                               # pylint: disable=W0611
+from jobcalc.geometry import BendGeometry, count_segments
+from jobcalc.geometry import bulk_segment_dims, find_segment_angles
+
+
+BEND = {"nomrad": 500, "casingod": 200, "liningod": 160}
+
+
+def bend_geometry(bendangle, segangle):
+
+    """
+    Returns a BendGeometry instance for the test bend.
+    """
+
+    return BendGeometry(BEND["nomrad"], BEND["casingod"], 180,
+                        BEND["liningod"], 140, bendangle, segangle)
+
+
+class SegmentCountTest(unittest.TestCase):
+
+    """
+    Tests that segment counts are exact for every valid segment angle.
+    """
+
+    def check_grid(self, bendangles):
+
+        """
+        Checks the candidates of find_segment_angles() for each bend
+        angle against exact division and against BendGeometry.
+        """
+
+        for bendangle in bendangles:
+            hundredths = int(round(bendangle * 100))
+            candidates = find_segment_angles(BEND["nomrad"],
+                                             BEND["casingod"],
+                                             BEND["liningod"], bendangle)
+            self.assertTrue(candidates)
+            for candidate in candidates:
+                exact = hundredths // int(round(candidate.segangle * 100))
+                self.assertEqual(candidate.num_segments, exact,
+                                 (bendangle, candidate.segangle))
+                self.assertEqual(bend_geometry(bendangle, candidate.segangle
+                                               ).num_segments, exact,
+                                 (bendangle, candidate.segangle))
+
+    def test_whole_degree_bends(self):
+
+        """
+        Whole degree bends from 1 to 90 degrees.
+        """
+
+        self.check_grid(range(1, 91))
+
+    def test_quarter_degree_bends(self):
+
+        """
+        Quarter degree bends from 0.25 to 90 degrees.
+        """
+
+        self.check_grid([n / 4.0 for n in range(1, 361)])
+
+    def test_known_cases(self):
+
+        """
+        Cases which floating point division counted one short.
+        """
+
+        for bendangle, segangle, segments in [(9, 3, 3), (9, 1.5, 6),
+                                              (11, 2.2, 5), (5, 0.01, 500),
+                                              (2.25, 0.75, 3)]:
+            self.assertEqual(count_segments(bendangle, segangle), segments)
+            self.assertEqual(bend_geometry(bendangle, segangle).num_segments,
+                             segments)
+            dims = bulk_segment_dims(BEND["nomrad"], BEND["casingod"],
+                                     BEND["liningod"], bendangle, segangle)
+            self.assertEqual(dims["num_segments"][0], segments)
+
+    def test_limits_use_exact_counts(self):
+
+        """
+        The segment count limit selects the exact count.
+        """
+
+        candidates = find_segment_angles(BEND["nomrad"], BEND["casingod"],
+                                         BEND["liningod"], 9,
+                                         {"num_segments": (3, 3)})
+        self.assertEqual([c.segangle for c in candidates], [3.0])
+
+
+class BulkSegmentDimsTest(unittest.TestCase):
+
+    """
+    Tests for bulk_segment_dims() arguments.
+    """
+
+    def test_generator_arguments(self):
+
+        """
+        Generators are read as one value per bend.
+        """
+
+        dims = bulk_segment_dims(500, (od for od in [200, 300]), 160, 9,
+                                 iter([3, 1.5]))
+        self.assertEqual(list(dims["num_segments"]), [3, 6])
+
+    def test_matches_bend_geometry(self):
+
+        """
+        Segment dimensions equal those calculated by BendGeometry.
+        """
+
+        for bendangle, segangle in [(90, 15), (45, 22.5), (11, 2.2)]:
+            dims = bulk_segment_dims(BEND["nomrad"], BEND["casingod"],
+                                     BEND["liningod"], bendangle, segangle)
+            segdims = bend_geometry(bendangle, segangle).segdims
+            for key, value in segdims.items():
+                self.assertEqual(dims[key][0], value, (key, segangle))
+
+    def test_bad_argument(self):
+
+        """
+        Arguments which are neither numbers nor iterables are rejected.
+        """
+
+        self.assertRaises(TypeError, bulk_segment_dims,
+                          500, 200, 160, 9, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
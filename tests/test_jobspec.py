@@ -0,0 +1,217 @@
+"""
+Tests for jobcalc.jobspec.
+
+The first error reported for each job is checked against the message
+which the original CGI form code, which stopped at the first error,
+gave for the same input.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import unittest
+import jctest
+from jobcalc.jobspec import FormError, DictForm, validate_job
+from jobcalc.jobspec import validate_many, split_spec
+
+
+def straight_job(**fields):
+
+    """
+    Returns a valid pipe straight job dictionary, with any fields
+    given as keyword arguments added or replaced.
+    """
+
+    job = {"jobtype": "pipestraight", "casingod": "200",
+           "casingid": "180", "liningod": "160", "liningid": "140",
+           "length": "3000", "flange": "200PN16", "output": "svg",
+           "outputsize": "Letter"}
+    job.update(fields)
+    return job
+
+
+# Jobs, and the first error the original form code reported for them
+
+FIRST_ERRORS = [
+    (dict(jctest.bend_job(), jobtype=None), "Type of job not specified!"),
+    (jctest.bend_job(jobtype="elbow"), "Invalid job type specified!"),
+    (jctest.bend_job(casingod=None), "Missing input &mdash; casingod!"),
+    (jctest.bend_job(liningid="ten"), "Bad value for liningid!"),
+    (jctest.bend_job(segangle="x"), "Bad value for segangle!"),
+    (jctest.bend_job(bendangle="45.5"), "Bad value for bendangle!"),
+    (jctest.bend_job(nomrad="0"), "nomrad must be greater than zero!"),
+    (jctest.bend_job(casingid="200"),
+     "casingod must be greater than casingid!"),
+    (jctest.bend_job(liningod="190"),
+     "casingid must be greater than liningod!"),
+    (jctest.bend_job(bendangle="95"),
+     "Bend angle must be greater than 0 degrees and no more than "
+     "90 degrees!"),
+    (jctest.bend_job(segangle="7"),
+     "Segment angle must divide into bend angle!"),
+    (jctest.bend_job(casing=None), "Type of casing not specified!"),
+    (jctest.bend_job(casing="welded"), "Invalid casing type specified!"),
+    (jctest.bend_job(output="gif"), "Invalid output type specified!"),
+    (jctest.bend_job(flange=None), "Type of flange not specified!"),
+    (jctest.bend_job(outputsize="A0"), "Invalid output size type specified!"),
+    (jctest.bend_job(qty="two"), "Quantity needs to be an integer!"),
+    (straight_job(length=None), "Missing input &mdash; length!"),
+    (straight_job(length="-1"), "length must be greater than zero!"),
+]
+
+
+class FirstErrorTest(unittest.TestCase):
+
+    """
+    Tests that the first error matches the original form code.
+    """
+
+    def test_messages(self):
+
+        """
+        Each invalid job raises FormError with the original message.
+        """
+
+        for job, message in FIRST_ERRORS:
+            job = dict((k, v) for k, v in job.items() if v is not None)
+            try:
+                validate_job(job)
+            except FormError as err:
+                self.assertEqual(str(err), message)
+                self.assertEqual(err.errors[0], message)
+            else:
+                self.fail("No error for %r" % message)
+
+    def test_all_errors(self):
+
+        """
+        All the errors in a job are collected, in the order in which
+        the original form code would have found them.
+        """
+
+        spec, errors = validate_many([jctest.bend_job(
+            casingod="x", liningod="190", segangle="0", qty="y",
+            output="gif")])[0]
+        self.assertEqual(errors, ["Bad value for casingod!",
+                                  "segangle must be greater than zero!",
+                                  "casingid must be greater than liningod!",
+                                  "Segment angle must divide into bend "
+                                  "angle!",
+                                  "Invalid output type specified!",
+                                  "Quantity needs to be an integer!"])
+        self.assertFalse("casingod" in spec)
+
+
+class SpecTest(unittest.TestCase):
+
+    """
+    Tests for the specifications of valid jobs.
+    """
+
+    def test_bend(self):
+
+        """
+        Numbers are converted, and flags and defaults are set.
+        """
+
+        spec = validate_job(jctest.bend_job(segdim="drg"))
+        self.assertEqual(spec["casingod"], 200)
+        self.assertEqual(spec["segangle"], 15.0)
+        self.assertTrue(isinstance(spec["segangle"], float))
+        self.assertEqual((spec["exdimdrg"], spec["exdimbox"]),
+                         (True, False))
+        self.assertEqual(spec["qty"], 1)
+        self.assertEqual(spec["customer"], "")
+
+        component, page = split_spec(spec)
+        self.assertEqual(component["jobtype"], "pipebend")
+        self.assertFalse("title" in component)
+        self.assertEqual(page["title"], "Test bend")
+        self.assertFalse("casingod" in page)
+
+    def test_segdim_list(self):
+
+        """
+        Multi-valued fields may be lists or comma separated strings.
+        """
+
+        for segdim in [["drg", "box"], "drg, box"]:
+            spec = validate_job(jctest.bend_job(segdim=segdim))
+            self.assertEqual((spec["exdimdrg"], spec["exdimbox"]),
+                             (True, True))
+
+    def test_quantity(self):
+
+        """
+        Quantities may be zero, and default to one only when missing.
+        """
+
+        self.assertEqual(validate_job(jctest.bend_job(qty=0))["qty"], 0)
+        self.assertEqual(validate_job(jctest.bend_job(qty="0"))["qty"], 0)
+        self.assertEqual(validate_job(jctest.bend_job(qty=3))["qty"], 3)
+        self.assertEqual(validate_job(jctest.bend_job(qty=""))["qty"], 1)
+        job = jctest.bend_job()
+        del job["qty"]
+        self.assertEqual(validate_job(job)["qty"], 1)
+
+    def test_text(self):
+
+        """
+        Text fields are converted to strings, and empty values are
+        empty strings.
+        """
+
+        spec = validate_job(jctest.bend_job(projno=1234, drgno=0,
+                                            title=""))
+        self.assertEqual(spec["projno"], "1234")
+        self.assertEqual(spec["drgno"], "0")
+        self.assertEqual(spec["title"], "")
+        self.assertEqual(validate_job(jctest.bend_job(
+            title=u"Bend \u00b0"))["title"], u"Bend \u00b0")
+
+    def test_text_not_list(self):
+
+        """
+        Lists and dictionaries are not accepted as text.
+        """
+
+        for value in [["a", "b"], {"a": "b"}]:
+            try:
+                validate_job(jctest.bend_job(customer=value))
+            except FormError as err:
+                self.assertEqual(err.errors, ["Bad value for customer!"])
+            else:
+                self.fail("No error for %r" % value)
+
+
+class DictFormTest(unittest.TestCase):
+
+    """
+    Tests for DictForm.
+    """
+
+    def test_values(self):
+
+        """
+        Empty values are missing, and strings are split into lists
+        on commas.
+        """
+
+        form = DictForm({"a": "", "b": "x", "c": "x, y,", "d": ["z"]})
+        self.assertEqual(form.getvalue("a"), None)
+        self.assertEqual(form.getvalue("missing"), None)
+        self.assertEqual(form.getvalue("b"), "x")
+        self.assertEqual(form.getlist("a"), [])
+        self.assertEqual(form.getlist("c"), ["x", "y"])
+        self.assertEqual(form.getlist("d"), ["z"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Tests for the Prometheus text rendering of jobcalc.metrics.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import threading
+import unittest
+import jctest                               # pylint: disable=W0611
+from jobcalc.metrics import MetricsRegistry, format_labels, format_value
+
+
+class FormatTest(unittest.TestCase):
+
+    """
+    Tests for the formatting of values and labels.
+    """
+
+    def test_values(self):
+
+        """
+        Values are written as floats, with infinity as "+Inf".
+        """
+
+        self.assertEqual(format_value(3), "3.0")
+        self.assertEqual(format_value(0.25), "0.25")
+        self.assertEqual(format_value(float("inf")), "+Inf")
+
+    def test_labels(self):
+
+        """
+        Labels are quoted, with backslashes, quotes and newlines
+        escaped.
+        """
+
+        self.assertEqual(format_labels((), ()), "")
+        self.assertEqual(format_labels(("route", "code"), ("draw", 200)),
+                         "{route=\"draw\",code=\"200\"}")
+        self.assertEqual(format_labels(("x",), ("a\\b\"c\nd",)),
+                         "{x=\"a\\\\b\\\"c\\nd\"}")
+        self.assertEqual(format_labels(("otype",), ("pdf",), ("le", "1.0")),
+                         "{otype=\"pdf\",le=\"1.0\"}")
+
+
+class RenderTest(unittest.TestCase):
+
+    """
+    Tests for the text exposition format of a registry.
+    """
+
+    def test_counter(self):
+
+        """
+        Counters are written with their help and type, one sample
+        per set of label values, in sorted order.
+        """
+
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests handled.",
+                                    ["route", "code"])
+        requests.inc(["preview", "200"])
+        requests.inc(["draw", "400"], 2)
+        requests.inc(["draw", "200"])
+
+        self.assertEqual(registry.render(),
+                         "# HELP requests_total Requests handled.\n"
+                         "# TYPE requests_total counter\n"
+                         "requests_total{route=\"draw\",code=\"200\"} 1.0\n"
+                         "requests_total{route=\"draw\",code=\"400\"} 2.0\n"
+                         "requests_total{route=\"preview\",code=\"200\"} "
+                         "1.0\n")
+
+    def test_histogram(self):
+
+        """
+        Histogram buckets are cumulative, and end with "+Inf", the
+        sum and the count.
+        """
+
+        registry = MetricsRegistry()
+        sizes = registry.histogram("bytes", "Sizes.", [10, 100])
+        for value in [5, 10, 50, 500]:
+            sizes.observe(value)
+
+        self.assertEqual(registry.render(),
+                         "# HELP bytes Sizes.\n"
+                         "# TYPE bytes histogram\n"
+                         "bytes_bucket{le=\"10.0\"} 2.0\n"
+                         "bytes_bucket{le=\"100.0\"} 3.0\n"
+                         "bytes_bucket{le=\"+Inf\"} 4.0\n"
+                         "bytes_sum 565.0\n"
+                         "bytes_count 4.0\n")
+
+    def test_empty(self):
+
+        """
+        Metrics with no samples are still described.
+        """
+
+        registry = MetricsRegistry()
+        registry.counter("a_total", "A.")
+        registry.histogram("b", "B.", labelnames=["otype"])
+
+        self.assertEqual(registry.render(),
+                         "# HELP a_total A.\n# TYPE a_total counter\n"
+                         "# HELP b B.\n# TYPE b histogram\n")
+
+    def test_threads(self):
+
+        """
+        Counts from several threads at once are not lost.
+        """
+
+        registry = MetricsRegistry()
+        counter = registry.counter("c_total", "C.")
+        histogram = registry.histogram("h", "H.", [1])
+
+        def work():
+
+            """
+            Updates both metrics many times.
+            """
+
+            for num in range(1000):         # pylint: disable=W0612
+                counter.inc()
+                histogram.observe(1)
+
+        threads = [threading.Thread(target=work) for num in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.get(), 8000)
+        self.assertTrue("h_count 8000.0" in registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,276 @@
+"""
+Tests for the job states of jobcalc.renderqueue.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+import jctest
+from jobcalc import renderqueue
+from jobcalc.jobspec import FormError
+from jobcalc.renderqueue import RenderQueue
+
+
+class FakePage:
+
+    """
+    Stands in for a DrawingPage, calling a function while drawing.
+
+    Public methods:
+    __init__()
+    draw_bytes()
+    """
+
+    def __init__(self, during=None):
+
+        """
+        Initializes a FakePage instance.
+
+        Arguments:
+        during -- optional function called while the page is drawn
+        """
+
+        self.during = during
+
+    def draw_bytes(self, timer=None):       # pylint: disable=W0613
+
+        """
+        Returns fake drawing bytes.
+        """
+
+        if self.during:
+            self.during()
+        return b"%PDF drawing"
+
+
+class RenderQueueTest(unittest.TestCase):
+
+    """
+    Tests for claiming, rendering, recovering and expiring jobs.
+    """
+
+    def setUp(self):
+
+        """
+        Creates a queue in a temporary database, drawing fake pages.
+        """
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.queue = RenderQueue(os.path.join(self.tmpdir, "jobs.db"),
+                                 poll_interval=0.01, run_timeout=60,
+                                 max_attempts=2)
+        self.conn = self.queue.connect()
+        self.during = None
+        self.saved = renderqueue.page_from_form
+        renderqueue.page_from_form = self.page_from_form
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+
+        """
+        Restores the drawing code and removes the database.
+        """
+
+        logging.disable(logging.NOTSET)
+        renderqueue.page_from_form = self.saved
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def page_from_form(self, form):
+
+        """
+        Returns a fake page for a job, failing for a job titled "fail".
+        """
+
+        if form.getvalue("title") == "fail":
+            raise ValueError("cannot draw")
+        return (FakePage(self.during), form.getvalue("output"))
+
+    def row(self, jobid):
+
+        """
+        Returns the (status, attempts, error) of a job.
+        """
+
+        return self.conn.execute("SELECT status, attempts, error "
+                                 "FROM jobs WHERE id = ?",
+                                 (jobid,)).fetchone()
+
+    def age(self, jobid, column, seconds):
+
+        """
+        Moves a time column of a job into the past.
+        """
+
+        self.conn.execute("UPDATE jobs SET %s = %s - ? WHERE id = ?" %
+                          (column, column), (seconds, jobid))
+
+    def abandon(self, jobid):
+
+        """
+        Makes a running job look abandoned, and recovers it.
+        """
+
+        self.age(jobid, "claimed", 120)
+        self.queue.purge()
+
+    def test_invalid_job(self):
+
+        """
+        Invalid jobs are refused when submitted.
+        """
+
+        self.assertRaises(FormError, self.queue.submit,
+                          jctest.bend_job(casingod="x"))
+
+    def test_claim(self):
+
+        """
+        Jobs are claimed once each, oldest first.
+        """
+
+        first = self.queue.submit(jctest.bend_job())
+        self.age(first, "created", 1)
+        second = self.queue.submit(jctest.bend_job())
+
+        self.assertEqual(self.queue.claim(self.conn)[0], first)
+        self.assertEqual(self.queue.claim(self.conn)[0], second)
+        self.assertEqual(self.queue.claim(self.conn), None)
+        self.assertEqual(self.row(first), ("running", 1, None))
+
+    def test_done(self):
+
+        """
+        A rendered job is done, with the drawing as its result.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job())
+        self.queue.work_once(self.conn)
+        self.assertEqual(self.queue.result(jobid),
+                         ("done", "pdf", b"%PDF drawing"))
+
+    def test_failed(self):
+
+        """
+        A job which fails to draw is failed, with the error.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job(title="fail"))
+        self.queue.work_once(self.conn)
+        self.assertEqual(self.queue.result(jobid),
+                         ("failed", "pdf", "cannot draw"))
+
+    def test_requeue(self):
+
+        """
+        An abandoned job is queued again, and claimed again.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job())
+        self.queue.claim(self.conn)
+        self.abandon(jobid)
+        self.assertEqual(self.row(jobid), ("queued", 1, None))
+
+        self.queue.work_once(self.conn)
+        self.assertEqual(self.row(jobid), ("done", 2, None))
+
+    def test_max_attempts(self):
+
+        """
+        A job abandoned after the maximum number of claims is failed.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job())
+        self.queue.claim(self.conn)
+        self.abandon(jobid)
+        self.queue.claim(self.conn)
+        self.abandon(jobid)
+        self.assertEqual(self.row(jobid), ("failed", 2,
+                                           "Render abandoned by its worker"))
+
+    def test_requeued_while_rendering(self):
+
+        """
+        A worker whose job was queued again and claimed by another
+        worker while it was rendering does not store its result.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job())
+        other = self.queue.connect()
+
+        def steal():
+
+            """
+            Recovers the job and claims it from another connection.
+            """
+
+            self.abandon(jobid)
+            self.queue.claim(other)
+
+        self.during = steal
+        self.queue.work_once(self.conn)
+        other.close()
+        self.assertEqual(self.row(jobid), ("running", 2, None))
+
+    def test_failed_while_rendering(self):
+
+        """
+        A job failed as abandoned while it was rendering is not
+        marked done.
+        """
+
+        jobid = self.queue.submit(jctest.bend_job())
+
+        def give_up():
+
+            """
+            Recovers the job on its last attempt, failing it.
+            """
+
+            self.conn.execute("UPDATE jobs SET attempts = 2 WHERE id = ?",
+                              (jobid,))
+            self.abandon(jobid)
+
+        self.during = give_up
+        self.queue.work_once(self.conn)
+        self.assertEqual(self.row(jobid), ("failed", 2,
+                                           "Render abandoned by its worker"))
+
+    def test_expiry(self):
+
+        """
+        Finished jobs expire after they finish, and unfinished jobs
+        after they are submitted.
+        """
+
+        done = self.queue.submit(jctest.bend_job())
+        self.queue.work_once(self.conn)
+        old_done = self.queue.submit(jctest.bend_job())
+        self.queue.work_once(self.conn)
+        old_queued = self.queue.submit(jctest.bend_job())
+        queued = self.queue.submit(jctest.bend_job())
+
+        self.age(old_done, "finished", 7200)
+        self.age(old_queued, "created", 7200)
+        self.queue.purge()
+
+        self.assertEqual(self.queue.status(done), "done")
+        self.assertEqual(self.queue.status(old_done), None)
+        self.assertEqual(self.queue.status(old_queued), None)
+        self.assertEqual(self.queue.status(queued), "queued")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+Tests for jobcalc.threadpool.
+
+On Python 2, these tests need the 'futures' package, and are skipped
+without it. The test comparing real drawings also needs Pycairo.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import time
+import threading
+import unittest
+from io import BytesIO
+import jctest
+from jobcalc import threadpool
+from jobcalc.threadpool import RenderPool
+from jobcalc.jobspec import validate_job
+
+
+HAVE_FUTURES = threadpool.ThreadPoolExecutor is not None
+
+
+class FakePage:
+
+    """
+    Stands in for a DrawingPage, drawing its number as bytes.
+
+    Public methods:
+    __init__()
+    draw_bytes()
+    draw()
+    """
+
+    def __init__(self, num, delay=0, gate=None, fail=False):
+
+        """
+        Initializes a FakePage instance.
+
+        Arguments:
+        num -- the number of the page
+        delay -- seconds taken to draw the page
+        gate -- optional threading.Event to wait for before drawing
+        fail -- True to raise an exception instead of drawing
+        """
+
+        self.num = num
+        self.delay = delay
+        self.gate = gate
+        self.fail = fail
+
+    def draw_bytes(self):
+
+        """
+        Returns the number of the page as bytes.
+        """
+
+        if self.gate:
+            self.gate.wait()
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError("page %d failed" % self.num)
+        return str(self.num).encode("utf-8")
+
+    def draw(self, outfile):
+
+        """
+        Writes the number of the page to a file object.
+        """
+
+        outfile.write(self.draw_bytes())
+
+
+@unittest.skipUnless(HAVE_FUTURES, "concurrent.futures is not available")
+class RenderPoolTest(unittest.TestCase):
+
+    """
+    Tests for RenderPool.
+    """
+
+    def test_map_order(self):
+
+        """
+        Drawings are returned in page order, however long each takes.
+        """
+
+        delays = [0.02, 0, 0.01, 0, 0.03, 0, 0.005, 0]
+        pages = [FakePage(n, d) for n, d in enumerate(delays)]
+        with RenderPool(threads=4) as pool:
+            self.assertEqual(list(pool.map(pages)),
+                             [str(n).encode("utf-8")
+                              for n in range(len(delays))])
+
+    def test_submit_blocks(self):
+
+        """
+        submit() blocks while max_pending pages are waiting, and
+        continues once one is drawn.
+        """
+
+        gate = threading.Event()
+        pool = RenderPool(threads=1, max_pending=2)
+        futures = [pool.submit(FakePage(n, gate=gate)) for n in range(2)]
+
+        submitted = threading.Event()
+
+        def submit_third():
+
+            """
+            Submits a third page.
+            """
+
+            futures.append(pool.submit(FakePage(2)))
+            submitted.set()
+
+        thread = threading.Thread(target=submit_third)
+        thread.start()
+        self.assertFalse(submitted.wait(0.1))
+
+        gate.set()
+        thread.join(5)
+        self.assertTrue(submitted.is_set())
+        self.assertEqual([f.result() for f in futures], [b"0", b"1", b"2"])
+        pool.shutdown()
+
+    def test_map_bounded(self):
+
+        """
+        map() takes pages only as there is room for them.
+        """
+
+        taken = []
+
+        def pages():
+
+            """
+            Generates pages, recording each one taken.
+            """
+
+            for num in range(20):
+                taken.append(num)
+                yield FakePage(num, 0.001)
+
+        with RenderPool(threads=2, max_pending=3) as pool:
+            for num, data in enumerate(pool.map(pages())):
+                self.assertEqual(data, str(num).encode("utf-8"))
+                self.assertTrue(len(taken) <= num + 1 + 3,
+                                (num, len(taken)))
+
+    def test_failures(self):
+
+        """
+        A failed page holds its exception, frees its place in the
+        pool, and is raised by map().
+        """
+
+        with RenderPool(threads=1, max_pending=1) as pool:
+            for num in range(3):
+                future = pool.submit(FakePage(num, fail=True))
+                self.assertRaises(ValueError, future.result)
+
+            results = pool.map([FakePage(0), FakePage(1, fail=True),
+                                FakePage(2)])
+            self.assertEqual(next(results), b"0")
+            self.assertRaises(ValueError, next, results)
+
+    def test_outfile(self):
+
+        """
+        Pages submitted with a file are drawn to it.
+        """
+
+        outfile = BytesIO()
+        with RenderPool(threads=1) as pool:
+            self.assertEqual(pool.submit(FakePage(7), outfile).result(),
+                             None)
+        self.assertEqual(outfile.getvalue(), b"7")
+
+
+@unittest.skipUnless(HAVE_FUTURES and jctest.have_cairo(),
+                     "concurrent.futures or Pycairo is not available")
+class ConcurrentDrawingTest(unittest.TestCase):
+
+    """
+    Tests that drawings made in several threads at once are the same
+    as drawings made one at a time.
+    """
+
+    def test_same_bytes(self):
+
+        """
+        The same pages, drawn serially and from a pool.
+        """
+
+        from jobcalc.form import page_from_spec
+
+        jobs = [jctest.bend_job(output="png"),
+                jctest.bend_job(output="svg", casing="onepiece"),
+                jctest.bend_job(output="png", jobtype="pipestraight",
+                                length="3000")]
+        pages = [page_from_spec(validate_job(job)) for job in jobs] * 4
+        serial = [page.draw_bytes() for page in pages]
+
+        with RenderPool(threads=4) as pool:
+            self.assertEqual(list(pool.map(pages)), serial)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Tests for jobcalc.timing.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import logging
+import threading
+import unittest
+import jctest                               # pylint: disable=W0611
+from jobcalc import timing
+from jobcalc.timing import StageTimer, stage, NULL_STAGE
+
+
+class Clock:
+
+    """
+    Stands in for a clock, advancing by a fixed step when read.
+
+    Public methods:
+    __init__()
+    __call__()
+    """
+
+    def __init__(self, step):
+
+        """
+        Initializes a Clock instance.
+        """
+
+        self.step = step
+        self.now = 0
+
+    def __call__(self):
+
+        """
+        Returns the time, and advances it.
+        """
+
+        self.now += self.step
+        return self.now
+
+
+class ListHandler(logging.Handler):
+
+    """
+    Logging handler keeping the messages it is given.
+    """
+
+    def __init__(self):
+
+        """
+        Initializes a ListHandler instance.
+        """
+
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+
+        """
+        Keeps the message of a record.
+        """
+
+        self.messages.append(record.getMessage())
+
+
+class StageTimerTest(unittest.TestCase):
+
+    """
+    Tests for StageTimer and stage().
+    """
+
+    def setUp(self):
+
+        """
+        Replaces the clocks with ones advancing one second, or one
+        millisecond of CPU time, each time they are read.
+        """
+
+        self.saved = (timing.default_timer, timing.cpu_clock)
+        timing.default_timer = Clock(1.0)
+        timing.cpu_clock = Clock(0.001)
+
+    def tearDown(self):
+
+        """
+        Restores the clocks and clears any active timer.
+        """
+
+        timing.default_timer, timing.cpu_clock = self.saved
+        timing.current.timer = None
+
+    def test_inactive(self):
+
+        """
+        Stages do nothing when no timer is active.
+        """
+
+        self.assertTrue(stage("draw") is NULL_STAGE)
+        with stage("draw"):
+            pass
+
+    def test_nested(self):
+
+        """
+        Nested stages are named by their path, in the order in which
+        they started.
+        """
+
+        timer = StageTimer()
+        timer.activate()
+        with stage("page"):
+            with stage("component"):
+                with stage("flanges"):
+                    pass
+            with stage("title"):
+                pass
+        timer.deactivate()
+
+        self.assertEqual(list(timer.totals()),
+                         ["page", "page/component",
+                          "page/component/flanges", "page/title"])
+        wall, cpu = timer.totals()["page/component/flanges"]
+        self.assertEqual(wall, 1.0)
+        self.assertAlmostEqual(cpu, 0.001)
+        self.assertEqual(timer.totals()["page"][0], 7.0)
+
+    def test_repeated(self):
+
+        """
+        The times of stages which run more than once are added.
+        """
+
+        timer = StageTimer()
+        timer.activate()
+        for num in range(3):                # pylint: disable=W0612
+            with stage("dims"):
+                pass
+        timer.deactivate()
+
+        self.assertEqual(len(timer.timings), 3)
+        self.assertEqual(timer.totals()["dims"][0], 3.0)
+
+    def test_exception(self):
+
+        """
+        A stage left by an exception is still recorded, and later
+        stages are not nested in it.
+        """
+
+        timer = StageTimer()
+        timer.activate()
+        try:
+            with stage("broken"):
+                raise ValueError("bad")
+        except ValueError:
+            pass
+        with stage("next"):
+            pass
+        timer.deactivate()
+
+        self.assertEqual(list(timer.totals()), ["broken", "next"])
+        self.assertEqual(timer.totals()["broken"][0], 1.0)
+
+    def test_activate_restores(self):
+
+        """
+        Deactivating a timer restores the one active before it.
+        """
+
+        outer = StageTimer()
+        inner = StageTimer()
+        outer.activate()
+        inner.activate()
+        with stage("inner"):
+            pass
+        inner.deactivate()
+        with stage("outer"):
+            pass
+        outer.deactivate()
+
+        self.assertEqual(list(inner.totals()), ["inner"])
+        self.assertEqual(list(outer.totals()), ["outer"])
+        self.assertTrue(stage("none") is NULL_STAGE)
+
+    def test_per_thread(self):
+
+        """
+        A timer active in one thread does not time another thread.
+        """
+
+        timer = StageTimer()
+        timer.activate()
+        found = []
+        thread = threading.Thread(target=lambda: found.append(stage("x")))
+        thread.start()
+        thread.join()
+        timer.deactivate()
+
+        self.assertTrue(found[0] is NULL_STAGE)
+
+    def test_log(self):
+
+        """
+        Totals are logged one line per stage, in milliseconds.
+        """
+
+        timer = StageTimer()
+        timer.record("page", 0.25, 0.125)
+        timer.record("page/title", 0.0015, 0.001)
+
+        logger = logging.getLogger("jobcalc.tests.timing")
+        handler = ListHandler()
+        logger.addHandler(handler)
+        try:
+            timer.log(logger, logging.WARNING)
+        finally:
+            logger.removeHandler(handler)
+
+        self.assertEqual(handler.messages,
+                         ["page: 250.000ms wall, 125.000ms cpu",
+                          "page/title: 1.500ms wall, 1.000ms cpu"])
+
+
+if __name__ == "__main__":
+    unittest.main()
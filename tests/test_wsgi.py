@@ -0,0 +1,309 @@
+"""
+Tests for the routes and status codes of jobcalc.wsgi.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import json
+import logging
+import zipfile
+import unittest
+import warnings
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+import jctest
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from jobcalc import wsgi
+
+
+def call(path, method="GET", query=None, body=b"", remote="127.0.0.1"):
+
+    """
+    Calls the WSGI application, and returns the status code, headers
+    and body of the response.
+    """
+
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path,
+               "QUERY_STRING": urlencode(query or {}),
+               "REMOTE_ADDR": remote, "wsgi.input": BytesIO(body),
+               "CONTENT_LENGTH": str(len(body))}
+    setup_testing_defaults(environ)
+    response = {}
+
+    # pylint: disable=W0613
+
+    def start_response(status, headers, exc_info=None):
+
+        """
+        Records the status and headers of the response.
+        """
+
+        response["code"] = int(status.split()[0])
+        response["headers"] = dict(headers)
+
+    # pylint: enable=W0613
+
+    body = b"".join(wsgi.application(environ, start_response))
+    return response["code"], response["headers"], body
+
+
+class RouteTest(unittest.TestCase):
+
+    """
+    Tests the status codes returned by each route.
+    """
+
+    def test_metrics_local_only(self):
+
+        """
+        Metrics are served to local clients, and refused to others.
+        """
+
+        code, headers, body = call("/metrics")
+        self.assertEqual(code, 200)
+        self.assertTrue(headers["Content-Type"].startswith("text/plain"))
+        self.assertTrue(b"# TYPE jobcalc_requests_total counter" in body)
+        self.assertEqual(call("/metrics", remote="192.0.2.1")[0], 403)
+
+    def test_draw_bad_form(self):
+
+        """
+        Invalid form input for a drawing is a 400 error listing the
+        problems, and is counted as a validation failure.
+        """
+
+        before = wsgi.validation_failures.get(["draw"])
+        code, headers, body = call("/", query={"jobtype": "pipebend"})
+        self.assertEqual(code, 400)
+        self.assertEqual(headers["Content-Type"], "text/html")
+        self.assertTrue(b"Missing input &mdash; casingod!" in body)
+        self.assertEqual(wsgi.validation_failures.get(["draw"]), before + 1)
+
+    def test_preview_bad_form(self):
+
+        """
+        Invalid form input for a preview is a 400 error.
+        """
+
+        code = call("/preview", query=jctest.bend_job(segangle="7"))[0]
+        self.assertEqual(code, 400)
+
+    def test_batch_method(self):
+
+        """
+        Batches must be posted.
+        """
+
+        self.assertEqual(call("/batch")[0], 405)
+
+    def test_batch_bad_body(self):
+
+        """
+        A batch which is not a list of job objects is a 400 error.
+        """
+
+        for body in [b"", b"not json", b"[1, 2]", b"[]"]:
+            self.assertEqual(call("/batch", "POST", body=body)[0], 400,
+                             body)
+
+    def test_batch_too_large(self):
+
+        """
+        A batch of more than BATCH_MAX_JOBS jobs is refused.
+        """
+
+        saved = wsgi.BATCH_MAX_JOBS
+        wsgi.BATCH_MAX_JOBS = 2
+        try:
+            body = json.dumps([jctest.bend_job()] * 3).encode("utf-8")
+            self.assertEqual(call("/batch", "POST", body=body)[0], 413)
+        finally:
+            wsgi.BATCH_MAX_JOBS = saved
+
+    def test_batch_invalid_jobs(self):
+
+        """
+        Invalid jobs in a batch are listed by number as JSON.
+        """
+
+        jobs = [jctest.bend_job(), jctest.bend_job(casingod="x"),
+                jctest.bend_job(qty="many")]
+        body = "\n".join(json.dumps(job) for job in jobs).encode("utf-8")
+        code, headers, body = call("/batch", "POST", body=body)
+        self.assertEqual(code, 400)
+        self.assertEqual(headers["Content-Type"], "application/json")
+        self.assertEqual(json.loads(body.decode("utf-8")),
+                         {"invalid": [
+                             {"job": 2, "errors": ["Bad value for casingod!"]},
+                             {"job": 3, "errors":
+                              ["Quantity needs to be an integer!"]}]})
+
+    def test_jobs_method(self):
+
+        """
+        Queued jobs must be posted.
+        """
+
+        self.assertEqual(call("/jobs")[0], 405)
+
+    def test_requests_counted(self):
+
+        """
+        Requests are counted by route and status code.
+        """
+
+        before = wsgi.requests_total.get(["batch", "405"])
+        call("/batch")
+        self.assertEqual(wsgi.requests_total.get(["batch", "405"]),
+                         before + 1)
+
+    def test_handler_error_counted(self):
+
+        """
+        A handler which raises before starting a response is counted
+        as a server error, and the error is passed on.
+        """
+
+        def broken(environ, start_response):    # pylint: disable=W0613
+
+            """
+            Fails before starting a response.
+            """
+
+            raise RuntimeError("broken")
+
+        before = wsgi.requests_total.get(["draw", "500"])
+        saved = wsgi.draw
+        wsgi.draw = broken
+        try:
+            self.assertRaises(RuntimeError, call, "/")
+        finally:
+            wsgi.draw = saved
+        self.assertEqual(wsgi.requests_total.get(["draw", "500"]),
+                         before + 1)
+
+    @unittest.skipUnless(jctest.have_cairo(), "Pycairo is not available")
+    def test_draw(self):
+
+        """
+        Valid form input returns a drawing of the requested type.
+        """
+
+        code, headers, body = call("/", query=jctest.bend_job())
+        self.assertEqual(code, 200)
+        self.assertEqual(headers["Content-Type"], "application/pdf")
+        self.assertTrue(body.startswith(b"%PDF"))
+
+
+class FakePage:
+
+    """
+    Stands in for a DrawingPage, drawing its title as its bytes.
+
+    Public methods:
+    __init__()
+    draw_bytes()
+    """
+
+    def __init__(self, spec):
+
+        """
+        Initializes a FakePage instance.
+        """
+
+        self.spec = spec
+
+    def draw_bytes(self):
+
+        """
+        Returns the title as bytes, or raises for a title of "fail".
+        """
+
+        if self.spec["title"] == "fail":
+            raise ValueError("cannot draw")
+        return self.spec["title"].encode("utf-8")
+
+
+class BatchArchiveTest(unittest.TestCase):
+
+    """
+    Tests for the ZIP archives returned for batches.
+    """
+
+    def setUp(self):
+
+        """
+        Replaces the drawing code with fake pages.
+        """
+
+        self.saved = wsgi.page_from_spec
+        wsgi.page_from_spec = FakePage
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+
+        """
+        Restores the drawing code.
+        """
+
+        logging.disable(logging.NOTSET)
+        wsgi.page_from_spec = self.saved
+
+    def post(self, jobs):
+
+        """
+        Posts a batch, and returns the archive returned.
+        """
+
+        body = json.dumps(jobs).encode("utf-8")
+        code, headers, body = call("/batch", "POST", body=body)
+        self.assertEqual(code, 200)
+        self.assertEqual(headers["Content-Type"], "application/zip")
+        return zipfile.ZipFile(BytesIO(body))
+
+    def test_names(self):
+
+        """
+        Drawings are named uniquely, without directories.
+        """
+
+        archive = self.post([jctest.bend_job(title="one", outfile="a.pdf"),
+                             jctest.bend_job(title="two", outfile="a.pdf"),
+                             jctest.bend_job(title="three",
+                                             outfile="../../etc/b.pdf"),
+                             jctest.bend_job(title="four", output="svg")])
+        self.assertEqual(archive.namelist(),
+                         ["a.pdf", "job0002.pdf", "b.pdf", "job0004.svg"])
+        self.assertEqual(archive.read("job0002.pdf"), b"two")
+
+    def test_failed_drawings(self):
+
+        """
+        Drawings which fail are left out and listed in errors.txt.
+        """
+
+        archive = self.post([jctest.bend_job(title="fail",
+                                             outfile="errors.txt"),
+                             jctest.bend_job(title="ok")])
+        self.assertEqual(archive.namelist(), ["job0002.pdf", "errors.txt"])
+        self.assertEqual(archive.read("errors.txt"),
+                         b"job 1 (errors.txt): ValueError: cannot draw\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for jobcalc.zipstream.
+
+Run from the top of the source tree with:
+
+  -- python -m unittest discover tests
+"""
+
+# Copyright 2013 Paul Griffiths
+# Email: mail@paulgriffiths.net
+#
+# All rights reserved.
+
+
+import zipfile
+import unittest
+from io import BytesIO
+import jctest                               # pylint: disable=W0611
+from jobcalc.zipstream import stream_zip
+
+
+FILES = [("a.pdf", b"%PDF" + b"\x00\x01" * 500),
+         ("b.svg", b"<svg>" + b"<g/>" * 500 + b"</svg>"),
+         ("errors.txt", b"job 3 (c.png): ValueError: bad\n")]
+
+
+def read_zip(chunks):
+
+    """
+    Returns a zipfile.ZipFile for the bytes of an archive.
+    """
+
+    return zipfile.ZipFile(BytesIO(b"".join(chunks)))
+
+
+class StreamZipTest(unittest.TestCase):
+
+    """
+    Tests for stream_zip().
+    """
+
+    def test_round_trip(self):
+
+        """
+        The archive holds each file, with its contents, in order.
+        """
+
+        archive = read_zip(stream_zip(FILES))
+        self.assertEqual(archive.testzip(), None)
+        self.assertEqual(archive.namelist(), [n for n, d in FILES])
+        for name, data in FILES:
+            self.assertEqual(archive.read(name), data)
+
+    def test_compression(self):
+
+        """
+        PDF and PNG files are stored, and others are compressed.
+        """
+
+        archive = read_zip(stream_zip(FILES))
+        types = dict((i.filename, i.compress_type)
+                     for i in archive.infolist())
+        self.assertEqual(types, {"a.pdf": zipfile.ZIP_STORED,
+                                 "b.svg": zipfile.ZIP_DEFLATED,
+                                 "errors.txt": zipfile.ZIP_DEFLATED})
+
+    def test_streamed(self):
+
+        """
+        Each file is returned before the next one is read.
+        """
+
+        taken = []
+
+        def files():
+
+            """
+            Generates the files, recording each one taken.
+            """
+
+            for name, data in FILES:
+                taken.append(name)
+                yield (name, data)
+
+        chunks = stream_zip(files())
+        output = []
+        for num in range(len(FILES)):
+            output.append(next(chunks))
+            self.assertEqual(len(taken), num + 1)
+        output.extend(chunks)
+
+        self.assertEqual(read_zip(output).namelist(), [n for n, d in FILES])
+
+    def test_empty(self):
+
+        """
+        An archive of no files is still a valid archive.
+        """
+
+        self.assertEqual(read_zip(stream_zip([])).namelist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,3 +28,65 @@ function changejob(form) {
 }
 
 
+//  Outline preview
+//
+//  The preview is drawn by the /preview route of the JobCalc WSGI
+//  application. It is redrawn once the form has not changed for
+//  previewdelay milliseconds, and only if a field it depends on has
+//  changed, so it is not requested for every keystroke.
+
+var previewurl = "/jobcalc/preview";
+var previewdelay = 250;
+var previewskip = ["qty", "title", "projno", "customer", "material", "bonding",
+                   "finish", "servicetemp", "drgno", "checkedby"];
+var previewtimer = null;
+var previewquery = "";
+
+function previewfields(form) {
+	var fields = [];
+
+	for ( var i=0; i < form.elements.length; ++i ) {
+		var el = form.elements[i];
+		if ( !el.name || el.type == "submit" || previewskip.indexOf(el.name) >= 0 ) {
+			continue;
+		}
+		if ( el.type == "checkbox" && !el.checked ) {
+			continue;
+		}
+		fields.push(encodeURIComponent(el.name) + "=" + encodeURIComponent(el.value));
+	}
+
+	return fields.join("&");
+}
+
+function updatepreview(form) {
+	var query = previewfields(form);
+
+	previewtimer = null;
+	if ( query != previewquery ) {
+		previewquery = query;
+		document.getElementById("preview").src = previewurl + "?" + query;
+	}
+}
+
+function schedulepreview(form) {
+	if ( previewtimer != null ) {
+		clearTimeout(previewtimer);
+	}
+	previewtimer = setTimeout(function() { updatepreview(form); }, previewdelay);
+}
+
+window.onload = function() {
+	var form = document.getElementById("jobform");
+	var preview = document.getElementById("preview");
+
+	//  Hide the preview while the form input is invalid, when the
+	//  preview route returns an error rather than an image.
+
+	preview.onload = function() { preview.style.visibility = "visible"; };
+	preview.onerror = function() { preview.style.visibility = "hidden"; };
+
+	form.onchange = function() { schedulepreview(form); };
+	form.onkeyup = function() { schedulepreview(form); };
+	updatepreview(form);
+};